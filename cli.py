@@ -0,0 +1,50 @@
+import argparse
+import runpy
+import sys
+
+
+# Each command runs scripts/<command>.py, so only the modules that
+# script imports get loaded
+COMMANDS = dict(
+    auto_caption="Transcribe, translate and upload captions for new videos",
+    benchmark_alignment="Compare speed and agreement of sentence alignment methods",
+    evaluate_alignment="Measure speed and accuracy of sentence alignment settings",
+    lint_captions="Check every caption file for bad cues and empty translations",
+    regenerate_srts="Regenerate the srts of translations which changed",
+    retime_video="Shift or retime every caption file of a video",
+    sync_all_captions="Sync community srts and translations, and upload them",
+    sync_captions="Sync and upload the captions of one video in one language",
+    sync_transcription_update="Realign and upload captions after an edit to a transcript",
+    upload_all_new_languages="Upload captions for every language not yet on YouTube",
+)
+# Commands which only work with local json and srt files, and so should start quickly
+LIGHTWEIGHT_COMMANDS = [
+    "benchmark_alignment",
+    "evaluate_alignment",
+    "lint_captions",
+    "regenerate_srts",
+    "retime_video",
+    "sync_captions",
+    "sync_all_captions",
+    "sync_transcription_update",
+]
+
+
+def run_command(command, args):
+    if command not in COMMANDS:
+        raise Exception(f"Unknown command {command}")
+    module = f"scripts.{command}"
+    sys.argv = [module, *args]
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Run any of the caption scripts',
+        epilog="\n".join(f"{command}: {help}" for command, help in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('command', type=str, choices=list(COMMANDS), metavar='command', help='Script to run, see below')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='Arguments for the script')
+    args = parser.parse_args()
+    run_command(args.command, args.args)
@@ -1,11 +1,7 @@
 import os
 from pathlib import Path
-import pysrt
 import numpy as np
 
-from pytube import YouTube
-from youtube_transcript_api import YouTubeTranscriptApi
-
 from helpers import extract_video_id
 from helpers import get_video_id_to_caption_directory_map
 from helpers import ensure_exists
@@ -16,10 +12,11 @@ from helpers import get_language_code
 from helpers import url_to_directory
 
 from srt_ops import write_srt
-from srt_ops import sub_rip_time_to_seconds
+from srt_ops import SubtitleTrack
 
 
 def download_youtube_audio(url, file_path):
+    from pytube import YouTube
     yt = YouTube(url)
     with temporary_message(f"Downloading to {file_path}"):
         ensure_exists(Path(file_path).parent)
@@ -48,10 +45,16 @@ def write_yt_transcript_as_srt(transcript, file_path, quiet=False):
         print(f"Captions downloaded successfully to '{file_path}'.")
 
 
+def list_youtube_transcripts(video_id):
+    # Only load youtube_transcript_api once transcripts are needed
+    from youtube_transcript_api import YouTubeTranscriptApi
+    return YouTubeTranscriptApi.list_transcripts(video_id)
+
+
 def get_caption_languages(video_id):
     try:
         # Fetch all transcripts
-        transcripts = YouTubeTranscriptApi.list_transcripts(video_id)
+        transcripts = list_youtube_transcripts(video_id)
         return set([t.language_code for t in transcripts])
     except Exception as e:
         print(f"An error occurred: {str(e)}")
@@ -69,13 +72,9 @@ def does_yt_transcript_match_srt(yt_transcript, srt_file):
         if seg["text"].strip()
     ]
     local_segs = [
-        (
-            clean_srt_segment_text(seg.text),
-            sub_rip_time_to_seconds(seg.start),
-            sub_rip_time_to_seconds(seg.end),
-        )
-        for seg in pysrt.open(str(srt_file))
-        if seg.text.strip()
+        (clean_srt_segment_text(text), start, end)
+        for text, start, end in SubtitleTrack.from_srt(srt_file)
+        if text.strip()
     ]
 
     # Check if the text is the same
@@ -97,7 +96,7 @@ def local_captions_match_youtube(srt_file):
     web_id = srt_file.parent.parent.stem
     video_id = get_web_id_to_video_id_map()[web_id]
 
-    transcripts = list(YouTubeTranscriptApi.list_transcripts(video_id))
+    transcripts = list(list_youtube_transcripts(video_id))
     languages = [t.language.lower() for t in transcripts]
     if language not in languages:
         return False
@@ -121,7 +120,7 @@ def find_mismatched_captions(video_url, languages=None):
     video_id = extract_video_id(video_url)
 
     with temporary_message(f"Pulling {web_id} transcripts"):
-        transcripts = list(YouTubeTranscriptApi.list_transcripts(video_id))
+        transcripts = list(list_youtube_transcripts(video_id))
 
     local_languages = [
         lang
@@ -167,7 +166,7 @@ def find_mismatched_captions(video_url, languages=None):
 def download_captions(video_id, directory, suffix="community"):
     try:
         # Fetch all transcripts
-        transcripts = YouTubeTranscriptApi.list_transcripts(video_id)
+        transcripts = list_youtube_transcripts(video_id)
 
         for transcript in transcripts:
             # Skip english
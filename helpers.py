@@ -4,19 +4,85 @@ import os
 import sys
 import re
 import json
-import pycountry
+import hashlib
+import heapq
+import sqlite3
+from collections import Counter
 from functools import lru_cache
+from functools import wraps
 from contextlib import contextmanager
+from contextlib import closing
 from pathlib import Path
 
-from pytube import YouTube
-from pytube.extract import video_id as extract_video_id
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 CAPTIONS_DIRECTORY = "/Users/grant/cs/captions"
 AUDIO_DIRECTORY = "/Users/grant/3Blue1Brown Dropbox/3Blue1Brown/audio_tracks"
 SENTENCE_ENDING_PATTERN = r'(?<=[.!?])\s+|\.$|(?<=[।۔՝։።။។፡。！？])'
 PUNCTUATION_PATTERN = r'(?<=[.!?,:;])\s+|\.$|(?<=[，।۔՝։።။។፡。！？])'
+CACHE_DIRECTORY = os.path.join(Path.home(), ".cache", "caption_ops")
+DISABLE_CACHE_ENV_VARIABLE_NAME = "CAPTION_OPS_DISABLE_CACHE"
+JSON_CODEC_ENV_VARIABLE_NAME = "CAPTION_OPS_JSON_CODEC"
+# Maps every digit to 0, so runs of digits can be found with a plain substring search
+DIGITS_TO_ZERO = bytes.maketrans(b"123456789", b"000000000")
+# Names of the languages we caption in (lower case) and their codes, as
+# pycountry gives them, except that YouTube expects 'iw' for Hebrew, and
+# pycountry only knows Greek as "Modern Greek (1453-)". Anything else
+# falls back to looking it up with pycountry.
+LANGUAGE_CODES = {
+    "arabic": "ar",
+    "armenian": "hy",
+    "bengali": "bn",
+    "bulgarian": "bg",
+    "catalan": "ca",
+    "chinese": "zh",
+    "croatian": "hr",
+    "czech": "cs",
+    "danish": "da",
+    "dutch": "nl",
+    "english": "en",
+    "finnish": "fi",
+    "french": "fr",
+    "georgian": "ka",
+    "german": "de",
+    "greek": "el",
+    "hebrew": "iw",
+    "hindi": "hi",
+    "hungarian": "hu",
+    "indonesian": "id",
+    "italian": "it",
+    "japanese": "ja",
+    "korean": "ko",
+    "lithuanian": "lt",
+    "marathi": "mr",
+    "norwegian": "no",
+    "persian": "fa",
+    "polish": "pl",
+    "portuguese": "pt",
+    "romanian": "ro",
+    "russian": "ru",
+    "serbian": "sr",
+    "slovak": "sk",
+    "spanish": "es",
+    "swedish": "sv",
+    "tamil": "ta",
+    "telugu": "te",
+    "thai": "th",
+    "turkish": "tr",
+    "ukrainian": "uk",
+    "urdu": "ur",
+    "vietnamese": "vi",
+}
+LANGUAGE_NAMES = {
+    code: (name.capitalize() if code != "el" else "Modern Greek (1453-)")
+    for name, code in LANGUAGE_CODES.items()
+    if code != "iw"
+}
+LANGUAGE_NAMES["he"] = "Hebrew"
 
 
 @contextmanager
@@ -48,15 +114,119 @@ def to_snake_case(name):
     return name.lower().replace(" ", "_").replace(":", "_").replace("__", "_").replace("/", "")
 
 
-def nearest_string(src, trg_list):
+def nearest_string(src, trg_list, max_distance=None):
     """
-    Return nearest string, and distance
+    Return nearest string, and distance, or (None, None) if no string
+    is within max_distance
     """
-    distances = [Levenshtein.distance(src, trg) for trg in trg_list]
+    distances = [Levenshtein.distance(src, trg, score_cutoff=max_distance) for trg in trg_list]
     index = np.argmin(distances)
+    if max_distance is not None and distances[index] > max_distance:
+        return None, None
     return trg_list[index], distances[index]
 
 
+def nearest_strings(src_list, trg_list, max_distance=None, q=3):
+    """
+    Same as [nearest_string(src, trg_list, max_distance) for src in src_list],
+    but only compares each src against the targets a StringIndex can't rule out
+    """
+    return StringIndex(trg_list, q).nearest_many(src_list, max_distance)
+
+
+def get_q_gram_counts(string, q=3):
+    return Counter(string[i:i + q] for i in range(len(string) - q + 1))
+
+
+class StringIndex:
+    """
+    Index over a list of strings for repeated nearest string queries.
+
+    Each edit destroys at most q of a string's q-grams, so the number of
+    q-grams two strings share, together with the difference in their
+    lengths, gives a lower bound on their edit distance. Queries compute
+    that bound against every target at once with numpy, then only run
+    Levenshtein.distance on targets in increasing order of the bound,
+    stopping once the bound exceeds the best distance found.
+    """
+    def __init__(self, strings, q=3):
+        self.strings = list(strings)
+        self.q = q
+        # Duplicates are indexed once, under their first position
+        self.first_positions = dict()
+        for position, string in enumerate(self.strings):
+            self.first_positions.setdefault(string, position)
+        unique_strings = list(self.first_positions)
+        self.unique_strings = unique_strings
+        self.positions = np.array(list(self.first_positions.values()), dtype=int)
+        self.lengths = np.array(list(map(len, unique_strings)), dtype=int)
+        self.n_grams = np.maximum(self.lengths - q + 1, 0)
+
+        postings = dict()
+        for string_id, string in enumerate(unique_strings):
+            for gram, count in get_q_gram_counts(string, q).items():
+                postings.setdefault(gram, ([], []))
+                postings[gram][0].append(string_id)
+                postings[gram][1].append(count)
+        self.postings = {
+            gram: (np.array(ids, dtype=int), np.array(counts, dtype=int))
+            for gram, (ids, counts) in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.strings)
+
+    def get_distance_lower_bounds(self, src):
+        shared = np.zeros(len(self.unique_strings), dtype=int)
+        for gram, count in get_q_gram_counts(src, self.q).items():
+            if gram in self.postings:
+                ids, counts = self.postings[gram]
+                shared[ids] += np.minimum(counts, count)
+        n_src_grams = max(len(src) - self.q + 1, 0)
+        missing = np.maximum(self.n_grams, n_src_grams) - shared
+        return np.maximum(np.abs(self.lengths - len(src)), -(-missing // self.q))
+
+    def nearest(self, src, max_distance=None):
+        """
+        Returns the nearest string and its distance, as nearest_string
+        would, or (None, None) if no string is within max_distance
+        """
+        if src in self.first_positions:
+            return src, 0
+        lower_bounds = self.get_distance_lower_bounds(src)
+        candidates = np.arange(len(lower_bounds))
+        if max_distance is not None:
+            candidates = candidates[lower_bounds <= max_distance]
+        candidates = candidates[np.argsort(lower_bounds[candidates], kind="stable")]
+
+        best_distance = max_distance
+        best_position = None
+        for string_id in candidates.tolist():
+            if best_distance is not None and lower_bounds[string_id] > best_distance:
+                break
+            distance = Levenshtein.distance(
+                src, self.unique_strings[string_id],
+                score_cutoff=best_distance,
+            )
+            position = int(self.positions[string_id])
+            # Ties go to the earliest string, as with np.argmin
+            if best_distance is None or distance < best_distance or (
+                distance == best_distance and (best_position is None or position < best_position)
+            ):
+                best_distance = distance
+                best_position = position
+        if best_position is None:
+            return None, None
+        return self.strings[best_position], best_distance
+
+    def nearest_many(self, src_list, max_distance=None):
+        results = dict()
+        for src in src_list:
+            if src not in results:
+                results[src] = self.nearest(src, max_distance)
+        return [results[src] for src in src_list]
+
+
 def get_sentences(full_text, end_marks=SENTENCE_ENDING_PATTERN):
     return [
         (sentence + mark).strip()
@@ -68,10 +238,10 @@ def get_sentences(full_text, end_marks=SENTENCE_ENDING_PATTERN):
 
 
 def get_language_code(language):
-    if language.lower() == "hebrew":
-        return 'iw'
-    if language.lower() == "greek":
-        return "el"
+    language = language.lower()
+    if language in LANGUAGE_CODES:
+        return LANGUAGE_CODES[language]
+    import pycountry
     lang_obj = pycountry.languages.get(name=language)
     if lang_obj is None:
         return None
@@ -79,6 +249,10 @@ def get_language_code(language):
 
 
 def get_language_from_code(language_code):
+    language_code = language_code.lower()
+    if language_code in LANGUAGE_NAMES:
+        return LANGUAGE_NAMES[language_code]
+    import pycountry
     lang_obj = pycountry.languages.get(alpha_2=language_code)
     if lang_obj is None:
         return None
@@ -88,45 +262,408 @@ def get_language_from_code(language_code):
 # Simple json wrappers
 
 
+def stdlib_json_loads(data):
+    return json.loads(data.decode('utf-8'))
+
+
+def stdlib_json_dumps(obj, indent=1, ensure_ascii=False):
+    return json.dumps(obj, indent=indent, ensure_ascii=ensure_ascii)
+
+
+def orjson_loads(data):
+    if b"0" * 19 in data.translate(DIGITS_TO_ZERO):
+        # orjson reads integers beyond 64 bits as floats
+        return stdlib_json_loads(data)
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        # e.g. NaN, Infinity or lone surrogates, which the json module accepts
+        return stdlib_json_loads(data)
+
+
+def orjson_dumps(obj, indent=1, ensure_ascii=False):
+    """
+    Same output as stdlib_json_dumps, using orjson for the common case of
+    indented, non-ascii-escaped output. Without indentation the json module
+    already uses its C encoder, so that is left to it.
+    """
+    if ensure_ascii or not isinstance(indent, int) or isinstance(indent, bool):
+        return stdlib_json_dumps(obj, indent, ensure_ascii)
+    try:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    except TypeError:
+        # Types orjson doesn't handle, like non-string keys or numpy scalars
+        return stdlib_json_dumps(obj, indent, ensure_ascii)
+    # orjson writes small and large floats without exponents, e.g. 0.00001 for
+    # the json module's 1e-05, and NaN as null, so only keep its output without
+    # these (or anything that looks like them, even within strings)
+    digits_as_zeros = data.translate(DIGITS_TO_ZERO)
+    if b"0e" in digits_as_zeros or b"0.0000" in digits_as_zeros or b"null" in data:
+        return stdlib_json_dumps(obj, indent, ensure_ascii)
+    return reindent_json(data, indent).decode('utf-8')
+
+
+def reindent_json(data, indent):
+    """
+    Changes json indented by two spaces per level to indent spaces per level.
+    Deeper lines are replaced first, with null bytes (which json can only hold
+    escaped) standing in for spaces so that shallower levels don't match them.
+    """
+    max_depth = 0
+    while b"\n" + b"  " * (max_depth + 1) in data:
+        max_depth += 1
+    for depth in range(max_depth, 0, -1):
+        data = data.replace(b"\n" + b"  " * depth, b"\n" + b"\0" * (indent * depth))
+    return data.replace(b"\0", b" ")
+
+
+# Named (loads, dumps) pairs, which must all give the same results
+JSON_CODECS = dict(json=(stdlib_json_loads, stdlib_json_dumps))
+if orjson is not None:
+    JSON_CODECS["orjson"] = (orjson_loads, orjson_dumps)
+
+
+def get_json_codec():
+    """
+    Returns the (loads, dumps) pair named by the CAPTION_OPS_JSON_CODEC
+    environment variable, defaulting to orjson when it is installed
+    """
+    name = os.getenv(JSON_CODEC_ENV_VARIABLE_NAME, "orjson" if "orjson" in JSON_CODECS else "json")
+    if name not in JSON_CODECS:
+        raise Exception(f"Unknown or unavailable json codec {name}")
+    return JSON_CODECS[name]
+
+
+def json_loads(data):
+    loads, dumps = get_json_codec()
+    return loads(data)
+
+
+def json_dumps(obj, indent=1, ensure_ascii=False):
+    loads, dumps = get_json_codec()
+    return dumps(obj, indent, ensure_ascii)
+
+
 def json_load(filename):
-    with open(filename, 'r', encoding='utf-8') as fp:
-        result = json.load(fp)
+    with open(filename, 'rb') as fp:
+        result = json_loads(fp.read())
     return result
 
 
 def json_dump(obj, filename, indent=1, ensure_ascii=False):
+    text = json_dumps(obj, indent=indent, ensure_ascii=ensure_ascii)
     with open(filename, 'w', encoding='utf-8') as fp:
-        result = json.dump(
-            obj, fp,
-            indent=indent,
-            ensure_ascii=ensure_ascii,
-        )
-    return result
+        fp.write(text)
+
+
+# Caching results on disk
+
+
+def write_if_changed(text, filename, encoding='utf-8'):
+    """
+    Writes text to a file, unless it already holds exactly those bytes,
+    so that regenerating files doesn't churn ones that didn't change.
+    Returns whether the file was written.
+    """
+    data = text.encode(encoding)
+    try:
+        if os.path.getsize(filename) == len(data) and Path(filename).read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    with open(filename, 'wb') as fp:
+        fp.write(data)
+    return True
+
+
+def to_hashable_json(obj):
+    # Arrays are hashed by their full contents, as their str is abbreviated
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError(f"Cannot hash object of type {type(obj).__name__}")
+
+
+def content_hash(*objs):
+    text = json.dumps(objs, ensure_ascii=False, sort_keys=True, default=to_hashable_json)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def json_disk_cache(name, version=1, max_entries=2000):
+    """
+    Decorator which saves the results of a function to disk, keyed by a
+    hash of the function's name, version, and its arguments, which should
+    be json serializable or numpy arrays, and results json serializable. Beyond max_entries, the
+    least recently used results are removed.
+
+    The cache cannot see changes to the code of the function, so version
+    must be bumped whenever its results for the same arguments change,
+    or stale results will keep being served.
+
+    Pass use_cache=False to the decorated function, or set the environment
+    variable CAPTION_OPS_DISABLE_CACHE, to bypass the cache.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, use_cache=True, **kwargs):
+            if not use_cache or os.getenv(DISABLE_CACHE_ENV_VARIABLE_NAME):
+                return func(*args, **kwargs)
+
+            cache_dir = Path(CACHE_DIRECTORY, name)
+            key = content_hash(func.__qualname__, version, args, kwargs)
+            path = Path(cache_dir, key + ".json")
+            if os.path.exists(path):
+                try:
+                    result = json_load(path)
+                    os.utime(path)  # Mark as recently used
+                    return result
+                except (ValueError, OSError):
+                    pass
+
+            result = func(*args, **kwargs)
+
+            # Write to a temporary file first, so that other processes
+            # never see a partially written entry
+            ensure_exists(cache_dir)
+            temp_path = Path(cache_dir, f"{path.stem}.{os.getpid()}.tmp")
+            json_dump(result, temp_path, indent=None)
+            os.replace(temp_path, path)
+
+            entries = [entry for entry in os.scandir(cache_dir) if entry.name.endswith(".json")]
+            if len(entries) > max_entries:
+                entries.sort(key=lambda entry: entry.stat().st_mtime)
+                for entry in entries[:len(entries) - max_entries]:
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+            return result
+        return wrapper
+    return decorator
 
 
 # Related to video file organization
 
 
+class CorpusManifest:
+    """
+    Every file under a root, indexed by file name, video directory (the
+    nearest one holding a video_url.txt) and language folder.
+
+    The first refresh is a single os.scandir walk. Later ones stat each
+    directory, and only list again those whose mtime changed, so the
+    manifest can be shared between calls, and saved between runs.
+    Call refresh before querying.
+    """
+    def __init__(self, root, directories=None):
+        self.root = str(root)
+        # Directory path -> [mtime_ns, file names, subdirectory names]
+        self.directories = directories or dict()
+        self.files = []  # (path, name, video directory, language), in os.walk order
+        self.name_to_positions = dict()
+
+    def refresh(self):
+        """
+        Brings the manifest up to date, returning whether anything changed
+        """
+        directories = dict()
+        changed = False
+        stack = [self.root]
+        while stack:
+            path = stack.pop()
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            entry = self.directories.get(path)
+            if entry is None or entry[0] != mtime_ns:
+                changed = True
+                file_names = []
+                subdir_names = []
+                try:
+                    dir_entries = list(os.scandir(path))
+                except OSError:
+                    # os.walk skips directories it can't list
+                    dir_entries = []
+                for dir_entry in dir_entries:
+                    if not dir_entry.is_dir():
+                        file_names.append(dir_entry.name)
+                    elif not dir_entry.is_symlink():
+                        # Like os.walk, don't follow links to directories
+                        subdir_names.append(dir_entry.name)
+                entry = [mtime_ns, file_names, subdir_names]
+            directories[path] = entry
+            stack.extend(os.path.join(path, name) for name in reversed(entry[2]))
+        changed = changed or directories.keys() != self.directories.keys()
+        self.directories = directories
+        if changed or not self.files:
+            self.build_index()
+        return changed
+
+    def build_index(self):
+        self.files = []
+        self.name_to_positions = dict()
+        stack = [(self.root, None, None)]
+        while stack:
+            path, video_dir, language = stack.pop()
+            if path not in self.directories:
+                continue
+            mtime_ns, file_names, subdir_names = self.directories[path]
+            if "video_url.txt" in file_names:
+                video_dir, language = path, None
+            for name in file_names:
+                self.name_to_positions.setdefault(name, []).append(len(self.files))
+                self.files.append((os.path.join(path, name), name, video_dir, language))
+            stack.extend(
+                (os.path.join(path, name), video_dir, (name if path == video_dir else language))
+                for name in reversed(subdir_names)
+            )
+
+    def iter_files(self, ending="", video_dir=None, language=None):
+        """
+        Lazily yields the paths ending with ending, in os.walk order,
+        optionally only those within one video directory or language
+        """
+        last_part = ending.split(os.sep)[-1]
+        position_lists = [
+            positions
+            for name, positions in self.name_to_positions.items()
+            if name.endswith(last_part)
+        ]
+        for position in heapq.merge(*position_lists):
+            path, name, file_video_dir, file_language = self.files[position]
+            if not path.endswith(ending):
+                continue
+            if video_dir is not None and file_video_dir != str(video_dir):
+                continue
+            if language is not None and file_language != language:
+                continue
+            yield path
+
+    def save(self, filename):
+        json_dump(dict(root=self.root, directories=self.directories), filename, indent=None)
+
+    @classmethod
+    def load(cls, filename):
+        data = json_load(filename)
+        return cls(data["root"], data["directories"])
+
+
+CORPUS_MANIFESTS = dict()
+
+
+def get_corpus_manifest(root=CAPTIONS_DIRECTORY, persist=False):
+    """
+    Returns the manifest for a root, shared within the process and refreshed
+    on each call. If persist is set, it's also saved in CACHE_DIRECTORY, so
+    the next run only has to look at what changed.
+    """
+    root = str(root)
+    manifest_file = Path(CACHE_DIRECTORY, f"corpus_manifest_{content_hash(root)[:16]}.json")
+    if root not in CORPUS_MANIFESTS:
+        if persist and os.path.exists(manifest_file):
+            CORPUS_MANIFESTS[root] = CorpusManifest.load(manifest_file)
+        else:
+            CORPUS_MANIFESTS[root] = CorpusManifest(root)
+    manifest = CORPUS_MANIFESTS[root]
+    changed = manifest.refresh()
+    if persist and changed:
+        ensure_exists(CACHE_DIRECTORY)
+        manifest.save(manifest_file)
+    return manifest
+
+
 def get_all_files_with_ending(ending, root=CAPTIONS_DIRECTORY):
-    result = []
-    for root, dirs, files in os.walk(root):
-        for file in files:
-            path = os.path.join(root, file)
-            if path.endswith(ending):
-                result.append(path)
-    return result
+    return list(get_corpus_manifest(root).iter_files(ending))
+
+
+def get_video_directory_index_path(root=CAPTIONS_DIRECTORY):
+    return Path(CACHE_DIRECTORY, f"video_directories_{content_hash(str(root))[:16]}.sqlite3")
+
+
+def connect_to_video_directory_index(root=CAPTIONS_DIRECTORY):
+    ensure_exists(CACHE_DIRECTORY)
+    conn = sqlite3.connect(get_video_directory_index_path(root), timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY, parent TEXT, mtime_ns INTEGER)")
+    conn.execute("CREATE TABLE IF NOT EXISTS videos (directory TEXT PRIMARY KEY, video_id TEXT)")
+    return conn
+
+
+def refresh_video_directory_index(root=CAPTIONS_DIRECTORY):
+    """
+    Brings the on-disk index of which directories hold a video_url.txt up
+    to date, and returns it as a map from video id to directory.
+
+    Only the root, year and video directories (plus those nested one level
+    further which hold their own video_url.txt, like shorts) are tracked.
+    Each is statted, and only those whose mtime changed are listed again,
+    so language folders and their files are never walked. Editing a
+    video_url.txt in place doesn't change any mtime, so delete the index
+    file to force a full rebuild after doing so.
+    """
+    root = str(root)
+    with closing(connect_to_video_directory_index(root)) as conn, conn:
+        known_mtimes = dict()
+        known_children = dict()
+        for path, parent, mtime_ns in conn.execute("SELECT path, parent, mtime_ns FROM directories"):
+            known_mtimes[path] = mtime_ns
+            known_children.setdefault(parent, []).append(path)
+
+        def forget(path):
+            # Compare prefixes directly, as LIKE would treat the underscores
+            # in directory names as wildcards
+            prefix = path + os.sep
+            conn.execute(
+                "DELETE FROM directories WHERE path = ? OR substr(path, 1, length(?)) = ?",
+                (path, prefix, prefix),
+            )
+            conn.execute(
+                "DELETE FROM videos WHERE directory = ? OR substr(directory, 1, length(?)) = ?",
+                (path, prefix, prefix),
+            )
+
+        def scan(path, parent, depth):
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                forget(path)
+                return
+            if known_mtimes.get(path) == mtime_ns:
+                children = known_children.get(path, [])
+            else:
+                entries = list(os.scandir(path))
+                url_file = os.path.join(path, "video_url.txt")
+                if any(entry.name == "video_url.txt" for entry in entries):
+                    video_id = extract_video_id(Path(url_file).read_text())
+                    conn.execute("INSERT OR REPLACE INTO videos VALUES (?, ?)", (path, video_id))
+                else:
+                    conn.execute("DELETE FROM videos WHERE directory = ?", (path,))
+                children = [
+                    entry.path for entry in entries
+                    if entry.is_dir() and (depth < 2 or os.path.exists(os.path.join(entry.path, "video_url.txt")))
+                ]
+                for old_child in set(known_children.get(path, [])).difference(children):
+                    forget(old_child)
+                conn.execute("INSERT OR REPLACE INTO directories VALUES (?, ?, ?)", (path, parent, mtime_ns))
+            for child in children:
+                scan(child, path, depth + 1)
+
+        scan(root, None, 0)
+        return dict(conn.execute("SELECT video_id, directory FROM videos ORDER BY directory"))
 
 
 @lru_cache()
 def get_video_id_to_caption_directory_map():
-    result = dict()
-    for file in get_all_files_with_ending("video_url.txt"):
-        url = Path(file).read_text()
-        result[extract_video_id(url)] = os.path.split(file)[0]
-    return result
+    return refresh_video_directory_index()
+
+
+def extract_video_id(video_url):
+    # pytube is slow to import, so only load it once it's needed
+    from pytube.extract import video_id
+    return video_id(video_url)
 
 
 def create_default_directory(video_url):
+    from pytube import YouTube
     yt = YouTube(video_url)
     year_str = str(yt.publish_date.year)
 
@@ -144,8 +681,11 @@ def create_default_directory(video_url):
     # Save the url in this directory so the association can be found later
     Path(directory, "video_url.txt").write_text(video_url)
 
-    # Clear this cache now that a new video_url.txt has been added
-    get_video_id_to_caption_directory_map.cache_clear()
+    # Record the new video_url.txt in the index, and in the map already loaded from it
+    video_id = extract_video_id(video_url)
+    with closing(connect_to_video_directory_index()) as conn, conn:
+        conn.execute("INSERT OR REPLACE INTO videos VALUES (?, ?)", (str(directory), video_id))
+    get_video_id_to_caption_directory_map()[video_id] = str(directory)
 
     return directory
 
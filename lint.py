@@ -0,0 +1,117 @@
+import os
+import numpy as np
+from collections import Counter
+from functools import partial
+from multiprocessing import Pool
+
+from helpers import json_load
+from helpers import get_all_files_with_ending
+from helpers import CAPTIONS_DIRECTORY
+
+from srt_ops import SubtitleTrack
+
+
+# Exactly the strings which re.sub(SENTENCE_ENDING_PATTERN, "", text) leaves
+# empty, i.e. those is_fully_populated_translation treats as having no content
+BLANK_SENTENCES = frozenset(["", ".", ".\n"])
+MAX_CHARS_PER_SECOND = 25
+LINT_CHECKS = ["overlap", "negative_duration", "chars_per_second", "empty_translation", "unreadable"]
+
+
+def find_empty_translations(translations):
+    """
+    Returns the indices of translations whose english input has
+    content, but whose translated text does not
+    """
+    has_input = np.array([obj["input"] not in BLANK_SENTENCES for obj in translations], dtype=bool)
+    has_output = np.array([obj["translatedText"] not in BLANK_SENTENCES for obj in translations], dtype=bool)
+    return np.flatnonzero(has_input & ~has_output)
+
+
+def find_cue_issues(n_chars, starts, ends, track_ids, max_cps=MAX_CHARS_PER_SECOND):
+    """
+    Runs the cue checks over the concatenated cues of many tracks at once,
+    with track_ids saying which track each cue came from.
+
+    Returns a dict mapping each check to the indices of the offending cues
+    """
+    durations = ends - starts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cps = n_chars / durations
+    # Only compare consecutive cues of the same track
+    overlaps = (starts[1:] < ends[:-1]) & (track_ids[1:] == track_ids[:-1])
+    return dict(
+        overlap=np.flatnonzero(overlaps),
+        negative_duration=np.flatnonzero(durations < 0),
+        chars_per_second=np.flatnonzero((durations >= 0) & (cps > max_cps)),
+    )
+
+
+def lint_files(files, max_cps=MAX_CHARS_PER_SECOND):
+    """
+    Lints a batch of srt and sentence_translations.json files, returning
+    a list of issues, each a dict with the file, check and cue index
+    """
+    issues = []
+    tracks = []
+    for file in files:
+        try:
+            if file.endswith(".srt"):
+                tracks.append((file, SubtitleTrack.from_srt(file)))
+            else:
+                for index in find_empty_translations(json_load(file)).tolist():
+                    issues.append(dict(file=file, check="empty_translation", index=index))
+        except Exception as e:
+            issues.append(dict(file=file, check="unreadable", error=str(e)))
+    if not tracks:
+        return issues
+
+    # Stack the cues of every track, so each check is one numpy operation over the batch
+    texts = [text for file, track in tracks for text in track.texts]
+    n_chars = np.array([len(text) - text.count("\n") for text in texts], dtype=float)
+    starts = np.hstack([track.starts for file, track in tracks])
+    ends = np.hstack([track.ends for file, track in tracks])
+    track_ids = np.repeat(np.arange(len(tracks)), [len(track) for file, track in tracks])
+    offsets = np.cumsum([0] + [len(track) for file, track in tracks])
+
+    for check, cue_indices in find_cue_issues(n_chars, starts, ends, track_ids, max_cps).items():
+        for cue_index in cue_indices.tolist():
+            track_id = track_ids[cue_index]
+            issues.append(dict(
+                file=tracks[track_id][0],
+                check=check,
+                index=int(cue_index - offsets[track_id]),
+                start=float(starts[cue_index]),
+                end=float(ends[cue_index]),
+                text=texts[cue_index],
+            ))
+    return issues
+
+
+def lint_captions(root=CAPTIONS_DIRECTORY, max_cps=MAX_CHARS_PER_SECOND, n_workers=None, batch_size=200):
+    """
+    Lints every srt and sentence translation file under root, split into
+    batches across a pool of processes, and returns a report with the
+    count of each kind of issue, and the issues themselves
+    """
+    files = sorted([
+        *get_all_files_with_ending(".srt", root=root),
+        *get_all_files_with_ending("sentence_translations.json", root=root),
+    ])
+    batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+    n_workers = n_workers or os.cpu_count()
+    if n_workers > 1 and len(batches) > 1:
+        with Pool(min(n_workers, len(batches))) as pool:
+            results = pool.map(partial(lint_files, max_cps=max_cps), batches)
+    else:
+        results = [lint_files(batch, max_cps) for batch in batches]
+
+    issues = [issue for result in results for issue in result]
+    counts = Counter(issue["check"] for issue in issues)
+    return dict(
+        root=str(root),
+        n_files=len(files),
+        max_chars_per_second=max_cps,
+        counts={check: counts[check] for check in LINT_CHECKS},
+        issues=issues,
+    )
@@ -4,21 +4,23 @@ import numpy as np
 from pathlib import Path
 import json
 import re
-import operator as op
-from torch.nn.modules import instancenorm
+from collections import Counter
+from functools import partial
+from multiprocessing import Pool
 from tqdm.auto import tqdm as ProgressDisplay
 
 from helpers import get_all_video_urls
 from helpers import get_web_id_to_video_id_map
 from srt_ops import srt_to_txt
-from srt_ops import interpolate
 from helpers import temporary_message
 from helpers import json_load
 from helpers import json_dump
 from helpers import get_language_code
 from helpers import get_all_files_with_ending
+from helpers import content_hash
+from helpers import ensure_exists
 from helpers import CAPTIONS_DIRECTORY
-from helpers import SENTENCE_ENDING_PATTERN
+from helpers import CACHE_DIRECTORY
 from helpers import PUNCTUATION_PATTERN
 
 from translate import get_sentence_translation_file
@@ -30,24 +32,24 @@ from sentence_timings import get_substring_timings_from_srt
 from sentence_timings import get_sentences_with_timings
 from sentence_timings import get_sentence_timings
 from sentence_timings import write_sentence_timing_file
+from sentence_timings import group_substrings_by_time_range
+
+from lint import find_empty_translations
 
 from upload import get_youtube_api
 from download import find_mismatched_captions
 
 
+# Hashes of the translation files each auto_generated.srt was last generated from
+SRT_INPUT_HASHES_FILE = os.path.join(CACHE_DIRECTORY, "srt_input_hashes.json")
+
+
 def is_fully_populated_translation(translation_file):
     """
     Returns false if any non-empty english sentence
     map to empty translated sentences
     """
-    trans = json_load(translation_file)
-    return not any(
-        op.and_(
-            bool(re.sub(SENTENCE_ENDING_PATTERN, "", obj["input"])),
-            not bool(re.sub(SENTENCE_ENDING_PATTERN, "", obj["translatedText"]))
-        )
-        for obj in trans
-    )
+    return len(find_empty_translations(json_load(translation_file))) == 0
 
 
 def merge_split_decimals(text):
@@ -129,6 +131,7 @@ def add_translation_time_ranges():
 
 
 def update_sentence_timing_in_translation_files():
+    updated_files = []
     for trans_file in get_all_translation_files():
         trans = json_load(trans_file)
         cap_dir = Path(trans_file).parent.parent
@@ -153,21 +156,72 @@ def update_sentence_timing_in_translation_files():
 
         json_dump(trans, trans_file)
 
-        # Rewrite the srt
-        if is_fully_populated_translation(trans_file):
-            try:
-                sentence_translations_to_srt(trans_file)
-            except Exception as e:
-                print(f"Failed to convert {trans_file} to srt\n\n{e}\n\n")
+        updated_files.append(trans_file)
 
+    # Rewrite the srts
+    regenerate_transcripts(updated_files)
 
-def regenerate_transcripts():
-    for trans_file in get_all_translation_files():
-        if is_fully_populated_translation(trans_file):
-            try:
-                sentence_translations_to_srt(trans_file)
-            except Exception as e:
-                print(f"Failed to convert {trans_file} to srt\n\n{e}\n\n")
+
+def regenerate_srt(trans_file, formats=("srt",)):
+    """
+    Rewrites the srt for a translation file, if it's fully populated.
+
+    Returns "written", "unchanged", "incomplete", or "failed" with the error
+    """
+    if not is_fully_populated_translation(trans_file):
+        return "incomplete"
+    srt_file = Path(Path(trans_file).parent, "auto_generated.srt")
+    old_bytes = srt_file.read_bytes() if os.path.exists(srt_file) else None
+    try:
+        sentence_translations_to_srt(trans_file, formats=formats)
+    except Exception as e:
+        return f"failed: {e}"
+    return "unchanged" if srt_file.read_bytes() == old_bytes else "written"
+
+
+def regenerate_transcripts(trans_files=None, formats=("srt",), n_workers=None, force=False):
+    """
+    Regenerates the srts for many translation files over a pool of processes.
+
+    The hash of each translation file is recorded in SRT_INPUT_HASHES_FILE
+    once its srt is generated, and files whose hash still matches are
+    skipped, unless force is set. Srts are only written if their bytes change.
+
+    Returns a Counter of the outcomes from regenerate_srt, plus "skipped"
+    """
+    if trans_files is None:
+        trans_files = get_all_translation_files()
+    trans_files = list(map(str, trans_files))
+    recorded_hashes = json_load(SRT_INPUT_HASHES_FILE) if os.path.exists(SRT_INPUT_HASHES_FILE) else dict()
+    input_hashes = {
+        trans_file: content_hash(Path(trans_file).read_text(encoding='utf-8'), list(formats))
+        for trans_file in trans_files
+    }
+    to_regenerate = [
+        trans_file
+        for trans_file in trans_files
+        if force or recorded_hashes.get(trans_file) != input_hashes[trans_file]
+        or not os.path.exists(Path(Path(trans_file).parent, "auto_generated.srt"))
+    ]
+
+    n_workers = n_workers or os.cpu_count()
+    if n_workers > 1 and len(to_regenerate) > 1:
+        with Pool(n_workers) as pool:
+            outcomes = pool.map(partial(regenerate_srt, formats=formats), to_regenerate, chunksize=16)
+    else:
+        outcomes = [regenerate_srt(trans_file, formats) for trans_file in to_regenerate]
+
+    for trans_file, outcome in zip(to_regenerate, outcomes):
+        if outcome in ("written", "unchanged"):
+            recorded_hashes[trans_file] = input_hashes[trans_file]
+        elif outcome.startswith("failed"):
+            print(f"Failed to convert {trans_file} to srt\n\n{outcome}\n\n")
+    ensure_exists(Path(SRT_INPUT_HASHES_FILE).parent)
+    json_dump(recorded_hashes, SRT_INPUT_HASHES_FILE)
+
+    result = Counter(outcome.split(":")[0] for outcome in outcomes)
+    result["skipped"] = len(trans_files) - len(to_regenerate)
+    return result
 
 
 def upload_all_titles():
@@ -284,25 +338,9 @@ def incorporate_srt_data_into_sentence_translations(translation_srt):
         max_length=90,
     )
 
-    def precedes(tr_sent_group, en_sent_group, alpha=0.5):
-        en_sent, en_start, en_end = en_sent_group
-        tr_sent, tr_start, tr_end = tr_sent_group
-        mid_time = interpolate(tr_start, tr_end, alpha)
-        return mid_time < en_end
-
     # Reconstruct aligning sentences
-    tr_sents = []
-    index = 0
-    for en_sent_group in en_sent_times:
-        tr_sent = ""
-        while precedes(tr_chunk_times[index], en_sent_group):
-            tr_sent += " " + tr_chunk_times[index][0].strip()
-            index += 1
-            if index >= len(tr_chunk_times):
-                break
-        tr_sents.append(tr_sent.strip())
-        if index >= len(tr_chunk_times):
-            break
+    en_time_ranges = [[start, end] for en_sent, start, end in en_sent_times]
+    tr_sents = group_substrings_by_time_range(tr_chunk_times, en_time_ranges)
 
     # Add these snippets to the translation file
     community_key = "from_community_srt"
@@ -534,7 +572,7 @@ def search_for_mismatches():
     from helpers import get_all_video_urls
     from helpers import extract_video_id
     from helpers import url_to_directory
-    from helpers import YouTube
+    from pytube import YouTube
 
     youtube_api = get_youtube_api()
     urls = get_all_video_urls()
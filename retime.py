@@ -0,0 +1,153 @@
+import os
+import numpy as np
+from pathlib import Path
+
+from helpers import json_load
+from helpers import json_dump
+
+from srt_ops import SubtitleTrack
+from srt_ops import write_caption_files
+from srt_ops import CAPTION_FORMATS
+
+from translate import sentence_translations_to_srt
+
+
+# Generated srts, and the timing file each is generated from
+GENERATED_SRT_SOURCES = {
+    "captions.srt": "sentence_timings.json",
+    "auto_generated.srt": "sentence_translations.json",
+}
+TIMING_FILE_NAMES = ["word_timings.json", "sentence_timings.json", "sentence_translations.json"]
+
+
+def apply_time_map(times, source_knots, target_knots):
+    """
+    Maps times through the piecewise-linear function sending each of
+    source_knots to the corresponding target_knots, continuing with slope 1
+    before the first and after the last knot. A single pair of knots is
+    therefore a plain shift. Times landing before zero, e.g. those within
+    a cut intro, become zero.
+    """
+    times = np.asarray(times, dtype=float)
+    source_knots = np.asarray(source_knots, dtype=float)
+    target_knots = np.asarray(target_knots, dtype=float)
+    if len(source_knots) == 0 or len(source_knots) != len(target_knots):
+        raise Exception("Need the same, non-zero, number of source and target knots")
+    if np.any(np.diff(source_knots) <= 0):
+        raise Exception("Source knots must be strictly increasing")
+
+    result = np.interp(times, source_knots, target_knots)
+    result = np.where(times < source_knots[0], times - source_knots[0] + target_knots[0], result)
+    result = np.where(times > source_knots[-1], times - source_knots[-1] + target_knots[-1], result)
+    return np.maximum(result, 0)
+
+
+def find_retimable_files(caption_dir, languages=None):
+    """
+    Returns the timing files and srts in a video's caption directory whose
+    times should be mapped directly. Generated srts are left out when the
+    file they are generated from exists, since they get regenerated instead.
+    """
+    result = []
+    for lang_dir in sorted(Path(caption_dir).iterdir()):
+        if not lang_dir.is_dir():
+            continue
+        if languages is not None and lang_dir.stem not in map(str.lower, languages):
+            continue
+        for name in TIMING_FILE_NAMES:
+            if os.path.exists(Path(lang_dir, name)):
+                result.append(Path(lang_dir, name))
+        for srt_file in sorted(lang_dir.glob("*.srt")):
+            source = GENERATED_SRT_SOURCES.get(srt_file.name)
+            if source is None or not os.path.exists(Path(lang_dir, source)):
+                result.append(srt_file)
+    return result
+
+
+def read_times(path):
+    """
+    Returns the contents of a timing file or srt, together with an
+    array of its [start, end] times
+    """
+    if path.suffix == ".srt":
+        data = SubtitleTrack.from_srt(path)
+        return data, np.array([data.starts, data.ends]).T
+    data = json_load(path)
+    if path.name == "sentence_translations.json":
+        # Translations from before time ranges were added have none, and stay NaN
+        times = [[obj.get("start", np.nan), obj.get("end", np.nan)] for obj in data]
+    else:
+        times = [[start, end] for text, start, end in data]
+    return data, np.array(times, dtype=float).reshape(-1, 2)
+
+
+def write_times(path, data, times):
+    if path.suffix == ".srt":
+        SubtitleTrack(data.texts, times[:, 0], times[:, 1]).write_srt(path)
+    elif path.name == "sentence_translations.json":
+        for obj, (start, end) in zip(data, times.tolist()):
+            if "start" in obj:
+                obj["start"] = start
+                obj["end"] = end
+        json_dump(data, path)
+    else:
+        rows = [[text, start, end] for (text, _, _), (start, end) in zip(data, times.tolist())]
+        # Word timings are stored without indentation, as in save_word_timings
+        json_dump(rows, path, indent=(None if path.name == "word_timings.json" else 1))
+
+
+def existing_caption_formats(srt_file):
+    return [
+        caption_format for caption_format in CAPTION_FORMATS
+        if os.path.exists(Path(srt_file).with_suffix("." + caption_format))
+    ]
+
+
+def regenerate_srts(timing_file):
+    """
+    Rewrites whichever of the generated srt and its other caption exports
+    already exist for a sentence timing or translation file
+    """
+    srt_names = [name for name, source in GENERATED_SRT_SOURCES.items() if source == timing_file.name]
+    if not srt_names:
+        return []
+    srt_file = Path(timing_file.parent, srt_names[0])
+    formats = existing_caption_formats(srt_file)
+    if not formats:
+        return []
+
+    if timing_file.name == "sentence_translations.json":
+        sentence_translations_to_srt(timing_file, formats=formats)
+    else:
+        sentence_timings = json_load(timing_file)
+        sentences = [sentence for sentence, start, end in sentence_timings]
+        time_ranges = [[start, end] for sentence, start, end in sentence_timings]
+        write_caption_files(sentences, time_ranges, srt_file, formats=formats)
+    return [srt_file.with_suffix("." + caption_format) for caption_format in formats]
+
+
+def retime_video(caption_dir, source_knots, target_knots, languages=None, decimals=3):
+    """
+    Applies one piecewise-linear time map (see apply_time_map) to all word
+    timings, sentence timings, sentence translations and srts of every
+    language of a video, then regenerates the generated srts whose timings
+    changed. Returns the list of files written.
+    """
+    files = find_retimable_files(caption_dir, languages)
+    contents = [read_times(path) for path in files]
+    if not contents:
+        return []
+
+    # Map every time of every file in one pass
+    all_times = np.vstack([times for data, times in contents])
+    new_all_times = np.round(apply_time_map(all_times, source_knots, target_knots), decimals)
+    splits = np.cumsum([len(times) for data, times in contents])[:-1]
+
+    written = []
+    for path, (data, times), new_times in zip(files, contents, np.split(new_all_times, splits)):
+        if np.array_equal(times, new_times, equal_nan=True):
+            continue
+        write_times(path, data, new_times)
+        written.append(path)
+        written.extend(regenerate_srts(path))
+    return written
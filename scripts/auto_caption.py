@@ -3,10 +3,10 @@ from typing import Optional
 
 import argparse
 import os
-from pytube import YouTube
 from pathlib import Path
 
 from helpers import url_to_directory
+from helpers import extract_video_id
 from helpers import json_load
 from helpers import ensure_exists
 from helpers import get_all_video_urls
@@ -23,7 +23,8 @@ from translate import translate_to_multiple_languages
 from translate import translate_video_details_multiple_languages
 from translate import TARGET_LANGUAGES
 
-from srt_ops import write_srt_from_sentences_and_time_ranges
+from srt_ops import write_caption_files
+from srt_ops import CAPTION_FORMATS
 
 from sentence_timings import get_sentences_with_timings
 from sentence_timings import write_sentence_timing_file
@@ -42,6 +43,7 @@ def write_whisper_transcription_files(
     captions_file_name="captions.srt",
     sentence_timings_file_name="sentence_timings.json",
     plain_text_file_name="transcript.txt",
+    formats=("srt",),
 ):
     word_timings_path = Path(directory, word_timings_file_name)
     captions_path = Path(directory, captions_file_name)
@@ -60,10 +62,18 @@ def write_whisper_transcription_files(
     if not os.path.exists(sentence_timings_path):
         sentences, time_ranges = get_sentences_with_timings(word_timings)
         write_sentence_timing_file(sentences, time_ranges, sentence_timings_path)
-
-    # Write an srt based on those word timeings
-    if not os.path.exists(captions_path):
-        write_srt_from_sentences_and_time_ranges(sentences, time_ranges, captions_path)
+    else:
+        sentence_timings = json_load(sentence_timings_path)
+        sentences = [sentence for sentence, start, end in sentence_timings]
+        time_ranges = [[start, end] for sentence, start, end in sentence_timings]
+
+    # Write captions based on those word timeings, in each format
+    missing_formats = [
+        caption_format for caption_format in formats
+        if not os.path.exists(captions_path.with_suffix("." + caption_format))
+    ]
+    if missing_formats:
+        write_caption_files(sentences, time_ranges, captions_path, formats=missing_formats)
 
     # Write the transcription in plain text
     if not os.path.exists(plain_text_file_path):
@@ -72,7 +82,7 @@ def write_whisper_transcription_files(
     return word_timings_path, captions_path, sentence_timings_path
 
 
-def auto_caption(video_url, upload=True, languages: Optional[list]=None):
+def auto_caption(video_url, upload=True, languages: Optional[list]=None, formats=("srt",)):
     youtube_api = get_youtube_api()
 
     languages = list(map(str.lower, languages or []))
@@ -89,17 +99,18 @@ def auto_caption(video_url, upload=True, languages: Optional[list]=None):
     # Transcribe
     _, _, sentence_timings_path = write_whisper_transcription_files(
         audio_file,
-        directory=ensure_exists(Path(caption_dir, "english"))
+        directory=ensure_exists(Path(caption_dir, "english")),
+        formats=formats,
     )
 
     # Translate
     if languages:
-        translate_to_multiple_languages(sentence_timings_path, languages)
+        translate_to_multiple_languages(sentence_timings_path, languages, formats=formats)
         translate_video_details_multiple_languages(youtube_api, video_url, languages)
 
     # Upload the results
     if upload:
-        video_id = YouTube(video_url).video_id
+        video_id = extract_video_id(video_url)
         for path in find_mismatched_captions(video_url, ["english", *languages]):
             print(path)
             try:
@@ -115,6 +126,7 @@ if __name__ == "__main__":
     parser.add_argument('video', type=str, help='YouTube url, or txt file with list of urls')
     parser.add_argument('--languages', nargs='+', type=str, help='languages')
     parser.add_argument('--no-upload', action='store_false', dest='upload', help='If set, upload will be disabled.')
+    parser.add_argument('--formats', nargs='+', type=str, default=["srt"], choices=CAPTION_FORMATS, help='Caption formats to write')
     args = parser.parse_args()
 
     # Check if arg was a url, or text file full of urls
@@ -133,4 +145,5 @@ if __name__ == "__main__":
             url,
             upload=args.upload,
             languages=languages,
+            formats=args.formats,
         )
\ No newline at end of file
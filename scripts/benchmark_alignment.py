@@ -0,0 +1,65 @@
+import argparse
+import os
+import time
+import numpy as np
+from pathlib import Path
+
+from helpers import json_load
+from helpers import get_sentences
+from helpers import get_all_files_with_ending
+
+from sentence_timings import ALIGNMENT_METHODS
+from sentence_timings import get_aligning_substring_indices
+
+
+def benchmark_alignment(word_timings_file, methods=tuple(ALIGNMENT_METHODS)):
+    """
+    Times each alignment method on the english transcript of one video,
+    and compares the boundaries each one finds against those of the first
+    """
+    folder = Path(word_timings_file).parent
+    words = [word for word, start, end in json_load(word_timings_file)]
+    full_text = "".join(words)
+    transcript = Path(folder, "transcript.txt")
+    if os.path.exists(transcript):
+        sentences = list(map(str.strip, transcript.read_text().split("\n")))
+    else:
+        sentences = get_sentences(full_text)
+
+    results = dict()
+    for method in methods:
+        start_time = time.perf_counter()
+        indices = get_aligning_substring_indices(
+            full_text, sentences, method, use_exact_matches=False,
+        )
+        results[method] = (time.perf_counter() - start_time, np.array(indices))
+
+    ref_time, ref_indices = results[methods[0]]
+    print(f"{folder.parent.stem}: {len(full_text)} characters, {len(sentences)} sentences")
+    for method, (run_time, indices) in results.items():
+        diffs = np.abs(indices - ref_indices)
+        print(
+            f"  {method:>8}: {run_time:8.3f}s, "
+            f"{np.mean(diffs > 0):6.1%} of boundaries differ from {methods[0]}, "
+            f"max difference {diffs.max()} characters"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare speed and agreement of sentence alignment methods')
+    parser.add_argument('path', type=str, help='A word_timings.json file, or a directory to search for them')
+    parser.add_argument('--methods', nargs='+', type=str, default=list(ALIGNMENT_METHODS), help='Alignment methods')
+    args = parser.parse_args()
+
+    if args.path.endswith(".json"):
+        files = [args.path]
+    else:
+        files = get_all_files_with_ending("word_timings.json", root=args.path)
+
+    totals = dict.fromkeys(args.methods, 0.0)
+    for file in files:
+        results = benchmark_alignment(file, args.methods)
+        for method, (run_time, indices) in results.items():
+            totals[method] += run_time
+    print("Total: " + ", ".join(f"{method} {total:.3f}s" for method, total in totals.items()))
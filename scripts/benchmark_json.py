@@ -0,0 +1,57 @@
+import argparse
+import time
+from pathlib import Path
+
+from helpers import get_all_files_with_ending
+from helpers import CAPTIONS_DIRECTORY
+from helpers import JSON_CODECS
+
+
+def benchmark_json(files, codecs=tuple(JSON_CODECS), n_repeats=3):
+    """
+    Times reading and re-serializing the given json files with each codec,
+    taking the best of n_repeats, and checks that every codec writes
+    exactly the bytes the json module does
+    """
+    contents = [Path(file).read_bytes() for file in files]
+    ref_loads, ref_dumps = JSON_CODECS["json"]
+    objs = [ref_loads(data) for data in contents]
+    ref_texts = [ref_dumps(obj) for obj in objs]
+
+    results = dict()
+    for codec in codecs:
+        loads, dumps = JSON_CODECS[codec]
+        load_time = dump_time = float("inf")
+        for n in range(n_repeats):
+            start_time = time.perf_counter()
+            loaded = [loads(data) for data in contents]
+            load_time = min(load_time, time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            texts = [dumps(obj) for obj in loaded]
+            dump_time = min(dump_time, time.perf_counter() - start_time)
+        mismatches = [file for file, text, ref_text in zip(files, texts, ref_texts) if text != ref_text]
+        results[codec] = (load_time, dump_time, mismatches)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare the speed of json codecs on sentence translation files, and check their output matches')
+    parser.add_argument('--root', type=str, default=CAPTIONS_DIRECTORY, help='Directory to search for sentence_translations.json files')
+    parser.add_argument('--limit', type=int, help='Only use this many files')
+    parser.add_argument('--repeats', type=int, default=3, help='Number of timing runs, taking the fastest')
+    parser.add_argument('--codecs', nargs='+', type=str, default=list(JSON_CODECS), help='Codecs to compare')
+    args = parser.parse_args()
+
+    files = get_all_files_with_ending("sentence_translations.json", root=args.root)[:args.limit]
+    n_bytes = sum(Path(file).stat().st_size for file in files)
+    print(f"{len(files)} files, {n_bytes / 1e6:.1f} MB")
+
+    results = benchmark_json(files, args.codecs, args.repeats)
+    for codec, (load_time, dump_time, mismatches) in results.items():
+        print(
+            f"{codec:>8}: load {load_time:7.3f}s  dump {dump_time:7.3f}s  "
+            f"{len(mismatches)} files formatted differently from json"
+        )
+        for file in mismatches[:10]:
+            print(f"  {file}")
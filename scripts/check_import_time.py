@@ -0,0 +1,64 @@
+import argparse
+import subprocess
+import sys
+
+from cli import LIGHTWEIGHT_COMMANDS
+
+
+# Dependencies which take long to import, and which lightweight commands should only load on use
+HEAVY_MODULES = [
+    "torch",
+    "whisper",
+    "pytube",
+    "pandas",
+    "pycountry",
+    "deepl",
+    "googleapiclient",
+    "google.cloud",
+    "google_auth_oauthlib",
+    "youtube_transcript_api",
+]
+IMPORT_TIMER = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+print(",".join(name for name in {heavy_modules!r} if name in sys.modules))
+"""
+
+
+def measure_import(module, n_runs=3):
+    """
+    Returns the fastest of several times to import module in a fresh
+    interpreter, and which heavy modules it loaded
+    """
+    times = []
+    for n in range(n_runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_TIMER.format(module=module, heavy_modules=HEAVY_MODULES)],
+            capture_output=True, text=True, check=True,
+        ).stdout.split("\n")
+        times.append(float(output[0]))
+    return min(times), [name for name in output[1].split(",") if name]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fail if any lightweight command is slow to start, or loads a heavy dependency')
+    parser.add_argument('--budget', type=float, default=0.5, help='Maximum import time for each command, in seconds')
+    parser.add_argument('--runs', type=int, default=3, help='Number of times to import each command, taking the fastest')
+    parser.add_argument('commands', nargs='*', default=LIGHTWEIGHT_COMMANDS, help='Commands to check')
+    args = parser.parse_args()
+
+    failures = []
+    for command in args.commands:
+        seconds, heavy_modules = measure_import(f"scripts.{command}", args.runs)
+        status = "ok"
+        if seconds > args.budget:
+            status = f"over the {args.budget}s budget"
+        elif heavy_modules:
+            status = "imports " + ", ".join(heavy_modules)
+        if status != "ok":
+            failures.append(command)
+        print(f"{command:>28}: {seconds:.3f}s  {status}")
+
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,77 @@
+import argparse
+import os
+import random
+import sys
+from pathlib import Path
+
+from helpers import json_load
+from helpers import get_all_files_with_ending
+from helpers import CAPTIONS_DIRECTORY
+
+from sentence_timings import get_sentence_timings
+from sentence_timings import update_sentence_timings
+
+from scripts.evaluate_alignment import apply_synthetic_edits
+
+
+def insert_and_delete(sentences, rng, n_edits=2):
+    """
+    Returns a copy of sentences with a few new ones inserted, and a few
+    removed, including at either end
+    """
+    sentences = list(sentences)
+    for n in range(n_edits):
+        sentences.insert(rng.randrange(len(sentences) + 1), "An inserted sentence.")
+    for index in [0, -1, *(rng.randrange(len(sentences)) for n in range(n_edits))]:
+        if len(sentences) > 1:
+            del sentences[index]
+    return sentences
+
+
+def check_incremental_timings(word_timings, sentences, edited_sentences):
+    """
+    Returns the indices of sentences whose timings from update_sentence_timings
+    differ from those of a full get_sentence_timings
+    """
+    old_timings = get_sentence_timings(word_timings, sentences, use_cache=False)
+    old_sentence_timings = [
+        [sent, start, end]
+        for sent, (start, end) in zip(sentences, old_timings)
+    ]
+    full = get_sentence_timings(word_timings, edited_sentences, use_cache=False)
+    incremental = update_sentence_timings(word_timings, old_sentence_timings, edited_sentences)
+    if len(full) != len(incremental):
+        return list(range(len(edited_sentences)))
+    return [n for n, (lh, rh) in enumerate(zip(full, incremental)) if lh != rh]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fail if incremental sentence timings differ from a full recompute')
+    parser.add_argument('--root', type=str, default=CAPTIONS_DIRECTORY, help='Directory to search for english sentence_timings.json files')
+    parser.add_argument('--edit-rate', type=float, default=0.1, help='Proportion of sentences to edit in place')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic edits')
+    args = parser.parse_args()
+
+    timing_files = [
+        file
+        for file in get_all_files_with_ending(os.path.join("english", "sentence_timings.json"), root=args.root)
+        if os.path.exists(Path(Path(file).parent, "word_timings.json"))
+    ]
+
+    failures = []
+    for n, timing_file in enumerate(timing_files):
+        word_timings = json_load(Path(Path(timing_file).parent, "word_timings.json"))
+        sentences = [sent for sent, start, end in json_load(timing_file)]
+        rng = random.Random(args.seed + n)
+        edits = dict(
+            in_place=apply_synthetic_edits(json_load(timing_file), args.edit_rate, args.seed + n)[0],
+            insert_delete=insert_and_delete(sentences, rng),
+        )
+        for name, edited_sentences in edits.items():
+            mismatches = check_incremental_timings(word_timings, sentences, edited_sentences)
+            if mismatches:
+                failures.append((timing_file, name))
+                print(f"{timing_file}: {len(mismatches)} {name} timings differ, first at sentence {mismatches[0]}")
+
+    print(f"{len(timing_files)} videos checked, {len(failures)} checks failed")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,161 @@
+import argparse
+import itertools
+import os
+import random
+import time
+import numpy as np
+from pathlib import Path
+
+from helpers import json_load
+from helpers import json_dump
+from helpers import get_all_files_with_ending
+from helpers import CAPTIONS_DIRECTORY
+
+from sentence_timings import get_sentence_timings
+
+
+STRATEGIES = dict(
+    greedy=dict(method="greedy"),
+    adaptive=dict(method="greedy", adaptive=True),
+    banded=dict(method="banded"),
+)
+# Parameters which are meaningful for each alignment method
+METHOD_PARAMETERS = dict(
+    greedy=["max_shift", "radius", "sentence_end_bias"],
+    banded=["max_shift", "sentence_end_bias"],
+)
+
+
+def swap_words(sentence, rng):
+    words = sentence.split(" ")
+    if len(words) < 2:
+        return sentence
+    n = rng.randrange(len(words) - 1)
+    words[n], words[n + 1] = words[n + 1], words[n]
+    return " ".join(words)
+
+
+def change_punctuation(sentence, rng):
+    if sentence and sentence[-1] in ".!?":
+        return sentence[:-1] + rng.choice([c for c in ".!?," if c != sentence[-1]])
+    return sentence + "."
+
+
+def apply_synthetic_edits(sentence_timings, edit_rate=0.1, seed=0):
+    """
+    Returns edited sentences, with word swaps, punctuation changes and merges
+    of adjacent sentences, together with the known-good time range for each
+    """
+    rng = random.Random(seed)
+    sentences = []
+    time_ranges = []
+    for sentence, start, end in sentence_timings:
+        if sentences and rng.random() < edit_rate / 3:
+            # Merge with the previous sentence
+            sentences[-1] = sentences[-1] + " " + sentence
+            time_ranges[-1][1] = end
+            continue
+        roll = rng.random()
+        if roll < edit_rate / 3:
+            sentence = swap_words(sentence, rng)
+        elif roll < 2 * edit_rate / 3:
+            sentence = change_punctuation(sentence, rng)
+        sentences.append(sentence)
+        time_ranges.append([start, end])
+    return sentences, time_ranges
+
+
+def get_parameter_sets(strategies, max_shifts, radii, biases):
+    grid = dict(max_shift=max_shifts, radius=radii, sentence_end_bias=biases)
+    result = []
+    for strategy in strategies:
+        settings = STRATEGIES[strategy]
+        names = METHOD_PARAMETERS[settings["method"]]
+        for values in itertools.product(*(grid[name] for name in names)):
+            result.append((strategy, dict(settings, **dict(zip(names, values)))))
+    return result
+
+
+def evaluate_alignment(
+    timing_files,
+    parameter_sets,
+    edit_rate=0.1,
+    error_budget=0.5,
+    use_exact_matches=True,
+    seed=0,
+):
+    """
+    For each video, edits the sentences in its known-good sentence_timings.json,
+    then realigns them to the word timings with each parameter set, measuring
+    how far the resulting sentence start and end times are from the truth
+    """
+    videos = []
+    for n, timing_file in enumerate(timing_files):
+        word_timings = json_load(Path(Path(timing_file).parent, "word_timings.json"))
+        sentences, true_ranges = apply_synthetic_edits(json_load(timing_file), edit_rate, seed + n)
+        videos.append((word_timings, sentences, np.array(true_ranges)))
+
+    report = []
+    for strategy, params in parameter_sets:
+        errors = []
+        run_time = 0
+        for word_timings, sentences, true_ranges in videos:
+            start_time = time.perf_counter()
+            time_ranges = get_sentence_timings(
+                word_timings, sentences,
+                use_exact_matches=use_exact_matches,
+                use_cache=False,
+                **params,
+            )
+            run_time += time.perf_counter() - start_time
+            errors.append(np.abs(np.array(time_ranges) - true_ranges).flatten())
+        errors = np.hstack(errors)
+        report.append(dict(
+            strategy=strategy,
+            params=params,
+            seconds=run_time,
+            mean_error=float(errors.mean()),
+            max_error=float(errors.max()),
+            within_budget=float(np.mean(errors <= error_budget)),
+        ))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure speed and accuracy of sentence alignment settings')
+    parser.add_argument('--root', type=str, default=CAPTIONS_DIRECTORY, help='Directory to search for english sentence_timings.json files')
+    parser.add_argument('--strategies', nargs='+', type=str, default=list(STRATEGIES), help='Alignment strategies')
+    parser.add_argument('--max-shifts', nargs='+', type=int, default=[50, 100, 300], help='Values of max_shift to try')
+    parser.add_argument('--radii', nargs='+', type=int, default=[10, 20], help='Values of radius to try')
+    parser.add_argument('--biases', nargs='+', type=int, default=[0, 2], help='Values of sentence_end_bias to try')
+    parser.add_argument('--edit-rate', type=float, default=0.1, help='Proportion of sentences to edit')
+    parser.add_argument('--budget', type=float, default=0.5, help='Acceptable timing error, in seconds')
+    parser.add_argument('--no-exact', action='store_false', dest='use_exact_matches', help='If set, fuzzily match all sentences')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic edits')
+    parser.add_argument('--output', type=str, help='Optional json file for the full report')
+    args = parser.parse_args()
+
+    timing_files = [
+        file
+        for file in get_all_files_with_ending(os.path.join("english", "sentence_timings.json"), root=args.root)
+        if os.path.exists(Path(Path(file).parent, "word_timings.json"))
+    ]
+    report = evaluate_alignment(
+        timing_files,
+        get_parameter_sets(args.strategies, args.max_shifts, args.radii, args.biases),
+        edit_rate=args.edit_rate,
+        error_budget=args.budget,
+        use_exact_matches=args.use_exact_matches,
+        seed=args.seed,
+    )
+
+    print(f"{len(timing_files)} videos, {args.edit_rate:.0%} of sentences edited\n")
+    for entry in sorted(report, key=lambda e: e["seconds"]):
+        params = ", ".join(f"{k}={v}" for k, v in entry["params"].items() if k != "method")
+        print(
+            f"{entry['strategy']:>8} {params:<55} {entry['seconds']:8.3f}s  "
+            f"mean error {entry['mean_error']:.3f}s  max {entry['max_error']:.2f}s  "
+            f"{entry['within_budget']:6.1%} within {args.budget}s"
+        )
+    if args.output:
+        json_dump(report, args.output)
@@ -0,0 +1,27 @@
+import argparse
+import sys
+
+from helpers import json_dump
+from helpers import CAPTIONS_DIRECTORY
+
+from lint import lint_captions
+from lint import MAX_CHARS_PER_SECOND
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check every caption file for overlapping cues, negative durations, fast cues and empty translations')
+    parser.add_argument('--root', type=str, default=CAPTIONS_DIRECTORY, help='Directory to lint')
+    parser.add_argument('--max-cps', type=float, default=MAX_CHARS_PER_SECOND, help='Maximum characters per second for a cue')
+    parser.add_argument('--workers', type=int, help='Number of processes, defaults to the number of cpus')
+    parser.add_argument('--output', type=str, help='Optional json file for the full report')
+    args = parser.parse_args()
+
+    report = lint_captions(args.root, max_cps=args.max_cps, n_workers=args.workers)
+    print(f"Linted {report['n_files']} files")
+    for check, count in report["counts"].items():
+        print(f"  {check:>18}: {count}")
+    if args.output:
+        json_dump(report, args.output)
+
+    # Fail if anything was found, so this can gate bulk uploads
+    sys.exit(1 if report["issues"] else 0)
@@ -0,0 +1,25 @@
+import argparse
+
+from helpers import CAPTIONS_DIRECTORY
+
+from srt_ops import CAPTION_FORMATS
+
+from reorganize import get_all_translation_files
+from reorganize import regenerate_transcripts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Regenerate the auto_generated.srt of every translation which changed since it was last generated')
+    parser.add_argument('--root', type=str, default=CAPTIONS_DIRECTORY, help='Directory to search for sentence_translations.json files')
+    parser.add_argument('--formats', nargs='+', type=str, default=["srt"], choices=CAPTION_FORMATS, help='Caption formats to write')
+    parser.add_argument('--workers', type=int, help='Number of processes, defaults to the number of cpus')
+    parser.add_argument('--force', action='store_true', help='If set, regenerate even translations which appear unchanged')
+    args = parser.parse_args()
+
+    outcomes = regenerate_transcripts(
+        get_all_translation_files(args.root),
+        formats=args.formats,
+        n_workers=args.workers,
+        force=args.force,
+    )
+    print(", ".join(f"{count} {outcome}" for outcome, count in outcomes.items()))
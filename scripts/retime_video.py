@@ -0,0 +1,35 @@
+import argparse
+import os
+
+from helpers import url_to_directory
+
+from retime import retime_video
+
+
+def parse_knot(knot):
+    source, target = knot.split(":")
+    return float(source), float(target)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Apply the same time shift, or piecewise-linear time map, to every caption file of a video')
+    parser.add_argument('video', type=str, help='Video url, or its caption directory')
+    parser.add_argument('--shift', type=float, help='Seconds to add to every time, e.g. -12.5 after cutting an intro')
+    parser.add_argument('--knots', nargs='+', type=str, help='Pairs old_time:new_time, with slope 1 outside of them. E.g. "0:0 12.5:0" for a cut 12.5s intro')
+    parser.add_argument('--languages', nargs='+', type=str, help='Only retime these languages')
+    args = parser.parse_args()
+
+    if (args.shift is None) == (args.knots is None):
+        raise Exception("Pass exactly one of --shift and --knots")
+    if args.shift is not None:
+        source_knots, target_knots = [0.0], [args.shift]
+    else:
+        source_knots, target_knots = zip(*map(parse_knot, args.knots))
+
+    if os.path.isdir(args.video):
+        caption_dir = args.video
+    else:
+        caption_dir = url_to_directory(args.video)
+
+    for path in retime_video(caption_dir, source_knots, target_knots, languages=args.languages):
+        print(f"Rewrote {path}")
@@ -1,13 +1,12 @@
 import argparse
 import os
 from pathlib import Path
-from pytube.extract import video_id as extract_video_id
-from pytube.extract import RegexMatchError
 import numpy as np
 import shutil
 
 from download import find_mismatched_captions
 
+from helpers import extract_video_id
 from helpers import get_web_id_to_video_id_map
 from helpers import get_web_id_to_caption_directory_map
 from helpers import url_to_directory
@@ -26,6 +25,7 @@ from upload import upload_video_localizations
 
 
 def convert_to_url(video_str):
+    from pytube.extract import RegexMatchError
     try:
         extract_video_id(video_str)
         return video_str
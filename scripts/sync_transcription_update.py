@@ -1,6 +1,5 @@
 import argparse
 import os
-import pysrt
 from pathlib import Path
 
 from helpers import get_web_id_to_video_id_map
@@ -11,16 +10,18 @@ from helpers import temporary_message
 from helpers import get_sentences
 
 from sentence_timings import get_sentence_timings
-from sentence_timings import find_closest_aligning_substrings
+from sentence_timings import update_sentence_timings
+from sentence_timings import SentenceAligner
 from sentence_timings import write_sentence_timing_file
 from srt_ops import write_srt_from_sentences_and_time_ranges
+from srt_ops import stream_srt_segments
 
 from upload import get_youtube_api
 from upload import upload_caption
 from upload import upload_video_localizations
 
 
-def main(input_file: str, upload=True):
+def main(input_file: str, upload=True, incremental=True, n_workers=1):
     input_path = Path(input_file)
     if not os.path.exists(input_path):
         raise Exception(f"{input_path} does not exist")
@@ -31,8 +32,10 @@ def main(input_file: str, upload=True):
             for line in input_path.read_text().split("\n")
         ])
     elif input_path.suffix == ".srt":
-        subs = pysrt.open(str(input_path))
-        full_text = " ".join([sub.text.replace("\n", " ") for sub in subs])
+        full_text = " ".join(
+            text.replace("\n", " ")
+            for text, start, end in stream_srt_segments(input_path)
+        )
     else:
         raise Exception("input_path must be txt or srt")
 
@@ -46,7 +49,12 @@ def main(input_file: str, upload=True):
     transcript_file = Path(folder, "transcript.txt")
 
     word_timings = json_load(word_timings_file)
-    timings = get_sentence_timings(word_timings, sentences)
+    if incremental and os.path.exists(sent_timings_file):
+        # Only realign the sentences which changed
+        old_sentence_timings = json_load(sent_timings_file)
+        timings = update_sentence_timings(word_timings, old_sentence_timings, sentences)
+    else:
+        timings = get_sentence_timings(word_timings, sentences)
 
     # Sync various iterations of the transcription
     write_sentence_timing_file(sentences, timings, sent_timings_file)
@@ -60,15 +68,18 @@ def main(input_file: str, upload=True):
         "sentence_translations.json",
         root=str(folder.parent),
     )
-    for trans_file in trans_files:
-        language = Path(trans_file).parent.stem
-        with temporary_message(f"Updating {language}"):
-            trans = json_load(trans_file)
-            trans_inputs = [obj['input'] for obj in trans]
-            new_inputs = find_closest_aligning_substrings(full_text, trans_inputs)
-            for obj, new_input in zip(trans, new_inputs):
-                obj['input'] = new_input.strip()
-            json_dump(trans, trans_file)
+    translations = [json_load(trans_file) for trans_file in trans_files]
+    aligner = SentenceAligner(full_text, sentences)
+    with temporary_message(f"Aligning {len(trans_files)} translation files"):
+        all_new_inputs = aligner.get_many_substrings(
+            [[obj['input'] for obj in trans] for trans in translations],
+            incremental=incremental,
+            n_workers=n_workers,
+        )
+    for trans_file, trans, new_inputs in zip(trans_files, translations, all_new_inputs):
+        for obj, new_input in zip(trans, new_inputs):
+            obj['input'] = new_input.strip()
+        json_dump(trans, trans_file)
             
     # Upload the results
     if upload:
@@ -85,6 +96,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Video ')
     parser.add_argument('file', type=str, help='Transcription file path, either transcription.txt or captions.srt')
     parser.add_argument('--no-upload', action='store_false', dest='upload', help='If set, upload will be disabled.')
+    parser.add_argument('--full', action='store_false', dest='incremental', help='If set, realign every sentence, not just those which changed.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of threads for aligning translation files')
     args = parser.parse_args()
 
-    main(args.file, upload=args.upload)
+    main(args.file, upload=args.upload, incremental=args.incremental, n_workers=args.workers)
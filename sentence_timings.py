@@ -1,16 +1,94 @@
 import re
 import numpy as np
-import pysrt
+from collections import deque
+from difflib import SequenceMatcher
+from concurrent.futures import ThreadPoolExecutor
 import Levenshtein
+from rapidfuzz import process as rapidfuzz_process
+from rapidfuzz.distance import Levenshtein as rapidfuzz_levenshtein
 from pathlib import Path
 
 from helpers import get_sentences
 from helpers import interpolate
 from helpers import json_dump
 from helpers import json_load
+from helpers import json_disk_cache
 from helpers import SENTENCE_ENDING_PATTERN
 
-from srt_ops import sub_rip_time_to_seconds
+from srt_ops import stream_srt_segments
+
+# Bump whenever a change to the alignment code changes which timings
+# get_sentence_timings returns, so stale results on disk are not reused
+SENTENCE_TIMINGS_CACHE_VERSION = 1
+
+
+def get_sentence_end_penalties(full_text, sentence_end_bias=2):
+    """
+    Array with an entry for each index of full_text (and one past the end),
+    which is 0 at the start of sentence-ending whitespace, and
+    sentence_end_bias elsewhere
+    """
+    penalties = np.full(len(full_text) + 1, sentence_end_bias, dtype=np.int32)
+    sent_end_indices = [
+        m.start() for m in re.finditer(SENTENCE_ENDING_PATTERN, full_text)
+    ]
+    penalties[sent_end_indices] = 0
+    return penalties
+
+
+def score_alignment_candidates(
+    full_text,
+    query,
+    guesses,
+    left_dist,
+    right_dist,
+    penalties,
+    score_cutoff=None,
+):
+    """
+    Returns the Levenshtein distance between query and the substring of
+    full_text around each guess, plus the corresponding penalty, computed
+    in one batched call. Distances above score_cutoff are reported
+    as score_cutoff + 1.
+    """
+    windows = [full_text[guess - left_dist:guess + right_dist] for guess in guesses.tolist()]
+    distances = rapidfuzz_process.cdist(
+        [query], windows,
+        scorer=rapidfuzz_levenshtein.distance,
+        score_cutoff=score_cutoff,
+        dtype=np.int32,
+    )[0]
+    return distances + penalties[guesses]
+
+
+def find_best_alignment_candidate(
+    full_text,
+    query,
+    guesses,
+    left_dist,
+    right_dist,
+    penalties,
+    mid_guess,
+):
+    """
+    Returns the guess with the lowest score from score_alignment_candidates,
+    together with that score
+    """
+    # Score the guesses at sentence ends first (or else the one nearest
+    # the middle) to get an upper bound on the best score, so that the
+    # full search can stop early on any candidate which cannot beat it
+    sent_end_guesses = guesses[penalties[guesses] == 0]
+    if len(sent_end_guesses) == 0:
+        sent_end_guesses = guesses[[np.argmin(np.abs(guesses - mid_guess))]]
+    upper_bound = score_alignment_candidates(
+        full_text, query, sent_end_guesses, left_dist, right_dist, penalties,
+    ).min()
+    scores = score_alignment_candidates(
+        full_text, query, guesses, left_dist, right_dist, penalties,
+        score_cutoff=max(upper_bound - penalties[guesses].min(), 0),
+    )
+    index = np.argmin(scores)
+    return int(guesses[index]), int(scores[index])
 
 
 def find_closest_aligning_substring_indices(
@@ -19,23 +97,36 @@ def find_closest_aligning_substring_indices(
     max_shift=300,
     radius=20,
     sentence_end_bias=2,
+    penalties=None,
+    adaptive=False,
+    min_shift=10,
+    poor_score=None,
+    drift_memory=10,
 ):
     """
     Returns a list of indices such that the substrings of full_text
-    between adjascent indices roughly match the corresponding sentence
+    between adjascent indices roughly match the corresponding sentence.
+
+    The output of get_sentence_end_penalties can be passed in as
+    penalties, if already computed.
+
+    If adaptive is True, each boundary is first searched for within a
+    narrower window, twice the largest shift between guess and chosen
+    boundary over the last drift_memory boundaries (but at least
+    min_shift). If the best score there is above poor_score (by default
+    a quarter of the query length), or lands on the edge of that window,
+    the search falls back to the full max_shift window.
     """
-    sent_end_indices = [
-        m.start() for m in re.finditer(SENTENCE_ENDING_PATTERN, full_text)
-    ]
+    if penalties is None:
+        penalties = get_sentence_end_penalties(full_text, sentence_end_bias)
+    recent_drifts = deque(maxlen=drift_memory)
     sent_indices = [0]
     for sent1, sent2 in zip(sentences, sentences[1:]):
         last_index = sent_indices[-1]
         mid_guess = last_index + len(sent1)
-        guess_range = range(
-            max(mid_guess - max_shift, last_index),
-            min(mid_guess + max_shift, len(full_text))
-        )
-        if len(guess_range) == 0:
+        full_lo = max(mid_guess - max_shift, last_index)
+        full_hi = min(mid_guess + max_shift, len(full_text))
+        if full_hi <= full_lo:
             sent_indices.append(last_index)
             continue
         left_dist = min(radius, len(sent1))
@@ -44,30 +135,365 @@ def find_closest_aligning_substring_indices(
             sent1[-left_dist:],
             sent2[:right_dist],
         ])
-        lds = [
-            Levenshtein.distance(
-                full_text[guess - left_dist:guess + right_dist],
-                query,
-            ) + sentence_end_bias * int(guess not in sent_end_indices)
-            for guess in guess_range
-        ]
-        sent_indices.append(guess_range[np.argmin(lds)])
+
+        def search(lo, hi):
+            return find_best_alignment_candidate(
+                full_text, query, np.arange(lo, hi),
+                left_dist, right_dist, penalties, mid_guess,
+            )
+
+        best_guess = None
+        if adaptive and recent_drifts:
+            shift = min(max_shift, max(min_shift, 2 * max(recent_drifts)))
+            lo = max(mid_guess - shift, full_lo)
+            hi = min(mid_guess + shift, full_hi)
+            if lo < hi:
+                guess, score = search(lo, hi)
+                on_edge = (guess == lo > full_lo) or (guess == hi - 1 < full_hi - 1)
+                max_score = (left_dist + right_dist) // 4 if poor_score is None else poor_score
+                if score <= max_score and not on_edge:
+                    best_guess = guess
+        if best_guess is None:
+            best_guess, score = search(full_lo, full_hi)
+
+        recent_drifts.append(abs(best_guess - mid_guess))
+        sent_indices.append(best_guess)
     sent_indices.append(len(full_text))  # Add final fence post
     return sent_indices
 
 
-def find_closest_aligning_substrings(full_text, sentences, **kwargs):
-    indices = find_closest_aligning_substring_indices(full_text, sentences, **kwargs)
-    return [full_text[i:j] for i, j in zip(indices, indices[1:])]
+def find_banded_aligning_substring_indices(
+    full_text,
+    sentences,
+    max_shift=300,
+    sentence_end_bias=2,
+    penalties=None,
+    block_size=1024,
+):
+    """
+    Alternative to find_closest_aligning_substring_indices which aligns all
+    sentences at once, rather than one boundary at a time. The sentences are
+    joined into one string, and a character-level edit distance alignment
+    between that and full_text is computed with dynamic programming, only
+    considering cells within max_shift of the diagonal. Sentence boundaries
+    are then read off from the optimal path, so one poorly matching
+    sentence cannot push all subsequent boundaries off.
+
+    This costs one vectorized update of 2 * max_shift + 1 cells per
+    character of the sentences, which is roughly 5-10x slower than the
+    greedy method when all sentences are fuzzily matched, and the moves
+    along the path take 2 bits per cell, e.g. around 30MB for a 200k
+    character transcript with the default max_shift. Run
+    scripts/benchmark_alignment.py before making it the default.
+
+    Returns the same list of fence-post indices.
+    """
+    if len(sentences) == 0:
+        return [0, len(full_text)]
+
+    query = " ".join(sentences)
+    n_rows = len(query)
+    n_cols = len(full_text)
+    q_codes = np.frombuffer(query.encode("utf-32-le"), dtype=np.uint32)
+
+    # Rows of the query holding the space which joins two sentences
+    join_rows = np.cumsum([len(sent) + 1 for sent in sentences[:-1]], dtype=int) - 1
+    is_join_row = np.zeros(n_rows + 1, dtype=bool)
+    is_join_row[join_rows] = True
+
+    # Extra cost for placing a sentence boundary away from a sentence end
+    end_penalty = penalties
+    if end_penalty is None:
+        end_penalty = get_sentence_end_penalties(full_text, sentence_end_bias)
+
+    # Band of columns considered for each row, centered on the diagonal.
+    # Row r covers the columns firsts[r] to firsts[r] + width - 1, some of
+    # which may lie outside the text near either end
+    band = max(max_shift, int(np.ceil(n_cols / max(n_rows, 1))) + 1)
+    width = 2 * band + 1
+    centers = np.round(np.arange(n_rows + 1) * n_cols / max(n_rows, 1)).astype(int)
+    firsts = (centers - band).tolist()
+    shifts = np.diff(centers, prepend=0).tolist()
+
+    # Pad the text codes and penalties by the band on each side, so that
+    # each row reads a window of fixed width. The padded codes never match
+    pad = band + 1
+    t_codes = np.full(n_cols + 2 * pad, np.iinfo(np.uint32).max, dtype=np.uint32)
+    t_codes[pad:pad + n_cols] = np.frombuffer(full_text.encode("utf-32-le"), dtype=np.uint32)
+    padded_penalty = np.zeros(n_cols + 2 * pad, dtype=np.int32)
+    padded_penalty[pad:pad + n_cols] = end_penalty[:n_cols]
+
+    # Costs of the previous row are held with a margin of impossible cells
+    # on either side, so the cells above and diagonally up-left of each cell
+    # in the current row are fixed offsets into it
+    big = np.iinfo(np.int32).max // 2
+    margin = max(shifts) + 1
+    prev = np.full(width + 2 * margin, big, dtype=np.int32)
+    curr = prev.copy()
+    offsets = np.arange(width, dtype=np.int32)
+    row_0 = firsts[0] + offsets
+    prev[margin:margin + width] = np.where(row_0 >= 0, row_0, big)
+
+    # Moves into each cell are kept as two bits, packed one block of rows
+    # at a time: whether it came from above rather than diagonally, and
+    # whether it came from the left
+    n_bytes = (width + 7) // 8
+    from_above = np.zeros((n_rows + 1, n_bytes), dtype=np.uint8)
+    from_left = np.zeros((n_rows + 1, n_bytes), dtype=np.uint8)
+    above_block = np.zeros((block_size, width), dtype=bool)
+    left_block = np.zeros((block_size, width), dtype=bool)
+    mismatch = np.zeros(width, dtype=bool)
+    diag = np.zeros(width, dtype=np.int32)
+    up = np.zeros(width, dtype=np.int32)
+    best = np.zeros(width, dtype=np.int32)
+    cells = curr[margin:margin + width]
+
+    for row in range(1, n_rows + 1):
+        first = firsts[row]
+        start = margin + shifts[row]
+
+        # Cost of arriving from the row above
+        np.add(prev[start:start + width], 1, out=up)
+
+        # Cost of arriving diagonally, by matching or substituting
+        text_start = pad + first - 1
+        np.not_equal(t_codes[text_start:text_start + width], q_codes[row - 1], out=mismatch)
+        np.add(prev[start - 1:start - 1 + width], mismatch, out=diag)
+        if is_join_row[row - 1]:
+            diag += padded_penalty[text_start:text_start + width]
+
+        # Arriving from the left depends on the current row, which is
+        # resolved with a running minimum of (cost - column)
+        np.minimum(diag, up, out=best)
+        np.subtract(best, offsets, out=cells)
+        np.minimum.accumulate(cells, out=cells)
+        cells += offsets
+        if first < 0:
+            # Columns before the start of the text can't be reached
+            cells[:-first] = big
+
+        block_row = row % block_size
+        np.less(up, diag, out=above_block[block_row])
+        np.less(cells, best, out=left_block[block_row])
+        if block_row == block_size - 1 or row == n_rows:
+            block_start = row - block_row
+            from_above[block_start:row + 1] = np.packbits(above_block[:block_row + 1], axis=1)
+            from_left[block_start:row + 1] = np.packbits(left_block[:block_row + 1], axis=1)
+        prev, curr = curr, prev
+        cells = curr[margin:margin + width]
+
+    # Trace back the optimal path, noting which column each joining space
+    # of the query lines up with
+    sent_indices = [0] * (len(sentences) + 1)
+    sent_indices[-1] = n_cols
+    boundary_number = dict(zip(join_rows.tolist(), range(1, len(sentences))))
+    row, col = n_rows, n_cols
+    while row > 0:
+        index = col - firsts[row]
+        bit = 7 - index % 8
+        if (from_left[row, index // 8] >> bit) & 1:
+            col -= 1
+            continue
+        diagonal = not (from_above[row, index // 8] >> bit) & 1
+        row -= 1
+        if diagonal:
+            col -= 1
+        if row in boundary_number:
+            sent_indices[boundary_number[row]] = col
+    return sent_indices
+
+
+ALIGNMENT_METHODS = dict(
+    greedy=find_closest_aligning_substring_indices,
+    banded=find_banded_aligning_substring_indices,
+)
+
+
+def find_exact_substring_indices(full_text, sentences, max_shift=300):
+    """
+    Returns fence-post indices, as in find_closest_aligning_substring_indices,
+    for those sentences which appear verbatim in full_text, in order. Any
+    boundary which cannot be pinned down this way, i.e. those between two
+    sentences which were edited, is left as None.
+    """
+    if len(sentences) == 0:
+        return [0, len(full_text)]
+    indices = [None] * (len(sentences) + 1)
+    indices[0] = 0
+    indices[-1] = len(full_text)
+    cursor = 0  # End of the last sentence found
+    pending_len = 0  # Length of the sentences not found since then
+    for n, sentence in enumerate(sentences):
+        start = re.compile(r"\s*").match(full_text, cursor).end()
+        if pending_len == 0 and full_text.startswith(sentence, start):
+            pos = start
+        else:
+            # Look for it a little past where it would be expected
+            search_end = cursor + pending_len + len(sentence) + max_shift
+            pos = full_text.find(sentence, start, search_end)
+            while pos > 0 and not full_text[pos - 1].isspace():
+                pos = full_text.find(sentence, pos + 1, search_end)
+        if len(sentence) == 0 or pos < 0:
+            pending_len += len(sentence) + 1
+            continue
+        ws_start = pos
+        while ws_start > cursor and full_text[ws_start - 1].isspace():
+            ws_start -= 1
+        if n > 0:
+            indices[n] = ws_start
+        cursor = pos + len(sentence)
+        indices[n + 1] = cursor
+        pending_len = 0
+    indices[-1] = len(full_text)
+    return indices
+
+
+class SentenceAligner:
+    """
+    Aligns lists of sentences against one fixed text, e.g. the english
+    transcript of a video, holding onto the work which depends only
+    on that text so that it can be shared across many sentence lists,
+    such as the inputs of each translation file.
+
+    If reference_sentences are passed in, these are assumed to be the
+    current sentences making up full_text, and are used by
+    update_substrings to realign edited versions of them.
+    """
+    def __init__(
+        self,
+        full_text,
+        reference_sentences=None,
+        method="greedy",
+        use_exact_matches=True,
+        sentence_end_bias=2,
+        **kwargs
+    ):
+        if method not in ALIGNMENT_METHODS:
+            raise Exception(f"Unknown alignment method {method}, options are {list(ALIGNMENT_METHODS)}")
+        self.full_text = full_text
+        self.align_function = ALIGNMENT_METHODS[method]
+        self.use_exact_matches = use_exact_matches
+        self.kwargs = dict(kwargs, sentence_end_bias=sentence_end_bias)
+        self.penalties = get_sentence_end_penalties(full_text, sentence_end_bias)
 
+        self.reference_sentences = reference_sentences
+        if reference_sentences is not None:
+            self.reference_indices = self.get_indices(reference_sentences)
 
-def get_sentence_timings(
+    def get_fuzzy_indices(self, sentences, start=0, end=None):
+        if end is None:
+            end = len(self.full_text)
+        indices = self.align_function(
+            self.full_text[start:end],
+            sentences,
+            penalties=self.penalties[start:end + 1],
+            **self.kwargs,
+        )
+        return [start + index for index in indices]
+
+    def get_indices(self, sentences, start=0, end=None):
+        """
+        Returns fence-post indices for the sentences within the span of
+        full_text between start and end. If use_exact_matches is True,
+        sentences which appear verbatim there are located directly, and
+        fuzzy matching is only run over the stretches of text between them.
+        """
+        if end is None:
+            end = len(self.full_text)
+        if not self.use_exact_matches:
+            return self.get_fuzzy_indices(sentences, start, end)
+
+        max_shift = self.kwargs.get("max_shift", 300)
+        indices = find_exact_substring_indices(self.full_text[start:end], sentences, max_shift)
+        indices = [start + index if index is not None else None for index in indices]
+        known = [n for n, index in enumerate(indices) if index is not None]
+        for lh, rh in zip(known, known[1:]):
+            if rh - lh < 2:
+                continue
+            # Fuzzily align the run of edited sentences to the text between
+            # the neighboring exact matches
+            sub_indices = self.get_fuzzy_indices(sentences[lh:rh], indices[lh], indices[rh])
+            indices[lh + 1:rh] = sub_indices[1:-1]
+        return indices
+
+    def get_substrings(self, sentences, start=0, end=None):
+        indices = self.get_indices(sentences, start, end)
+        return [self.full_text[i:j] for i, j in zip(indices, indices[1:])]
+
+    def update_substrings(self, old_substrings):
+        """
+        For when the reference sentences are an edited version of
+        old_substrings. Substrings which match an unchanged sentence are
+        kept as is, and each run of changed ones is only aligned against
+        the text of the reference sentences which replaced it.
+
+        Returns a list with one substring for each of old_substrings
+        """
+        new_sentences = self.reference_sentences
+        new_indices = self.reference_indices
+        if new_sentences is None:
+            raise Exception("SentenceAligner needs reference_sentences to update substrings")
+
+        result = []
+        old_sentences = list(map(str.strip, old_substrings))
+        matcher = SequenceMatcher(None, old_sentences, new_sentences, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                result.extend(old_substrings[i1:i2])
+            elif i1 < i2:
+                result.extend(self.get_substrings(
+                    old_substrings[i1:i2], new_indices[j1], new_indices[j2]
+                ))
+        return result
+
+    def get_many_substrings(self, sentence_lists, incremental=False, n_workers=1):
+        """
+        Aligns each list in sentence_lists, optionally across several
+        worker threads. If incremental is True, this uses update_substrings,
+        otherwise get_substrings.
+        """
+        function = self.update_substrings if incremental else self.get_substrings
+        if n_workers == 1:
+            return list(map(function, sentence_lists))
+        with ThreadPoolExecutor(n_workers) as executor:
+            return list(executor.map(function, sentence_lists))
+
+
+def get_aligning_substring_indices(full_text, sentences, method="greedy", **kwargs):
+    return SentenceAligner(full_text, method=method, **kwargs).get_indices(sentences)
+
+
+def find_closest_aligning_substrings(full_text, sentences, method="greedy", **kwargs):
+    return SentenceAligner(full_text, method=method, **kwargs).get_substrings(sentences)
+
+
+def nearest_indices(sorted_values, targets):
+    """
+    For each target, returns the index of the nearest entry in sorted_values,
+    with ties going to the earliest such entry. This matches
+    np.argmin(np.abs(sorted_values - target)) for each target, but
+    uses a binary search rather than a full scan.
+    """
+    sorted_values = np.asarray(sorted_values)
+    targets = np.asarray(targets)
+    right = np.searchsorted(sorted_values, targets)
+    left = np.maximum(right - 1, 0)
+    right = np.minimum(right, len(sorted_values) - 1)
+    use_right = np.abs(sorted_values[right] - targets) < np.abs(sorted_values[left] - targets)
+    nearest = np.where(use_right, right, left)
+    # For repeated values, pick the first instance
+    return np.searchsorted(sorted_values, sorted_values[nearest])
+
+
+def get_sentence_time_arrays(
     # List of triplets, (word, start_time, end_time)
     words_with_timings,
     # The assumption is that these loosely match those formed by
     # concatenating the words from words_with_timings, and can
     # be fuzzily matched to the appropriate positions there
     sentences,
+    # Which alignment engine to use, "greedy" or "banded"
+    method="greedy",
     # Paramaeters fuzzy matching of sentences to indices in the full text,
     # max_shift and radius
     **kwargs
@@ -75,14 +501,18 @@ def get_sentence_timings(
     """
     Given the start and end times for a sequence of words, find the
     start and end times for setences they make up. Uses fuzzy matching
-    to find alignments of the sentence to the full text
+    to find alignments of the sentence to the full text.
+
+    Returns two arrays, the start times and end times of each sentence
     """
     words, starts, ends = zip(*words_with_timings)
+    starts = np.array(starts)
+    ends = np.array(ends)
     if sentences is None:
         sentences = get_sentences("".join(words))
 
     if len(sentences) == 0:
-        return []
+        return np.zeros(0), np.zeros(0)
 
     # Word indices
     full_text = "".join(words)
@@ -90,14 +520,27 @@ def get_sentence_timings(
     word_indices = np.array([0, *np.cumsum(word_lens[:-1])])
 
     # Sentence indices, based on fuzzier matching
-    sent_indices = find_closest_aligning_substring_indices(full_text, sentences, **kwargs)
+    sent_indices = get_aligning_substring_indices(full_text, sentences, method, **kwargs)
 
-    time_ranges = []
-    for lh, rh in zip(sent_indices, sent_indices[1:]):
-        start = starts[np.argmin(abs(word_indices - lh))]
-        end = ends[np.argmin(abs(word_indices - rh)) - 1]
-        time_ranges.append([start, end])
-    return time_ranges
+    # Snap the boundaries of each sentence to the nearest word
+    word_starts = nearest_indices(word_indices, sent_indices[:-1])
+    word_ends = nearest_indices(word_indices, sent_indices[1:]) - 1
+    return starts[word_starts], ends[word_ends]
+
+
+@json_disk_cache("sentence_timings", version=SENTENCE_TIMINGS_CACHE_VERSION)
+def get_sentence_timings(words_with_timings, sentences, method="greedy", **kwargs):
+    """
+    Same as get_sentence_time_arrays, but returns a list of
+    [start, end] pairs for each sentence.
+
+    Results are cached on disk, keyed by the content of the word timings,
+    sentences and parameters, so unchanged inputs are never realigned.
+    Pass use_cache=False to skip this, and bump
+    SENTENCE_TIMINGS_CACHE_VERSION after changing how timings are found.
+    """
+    starts, ends = get_sentence_time_arrays(words_with_timings, sentences, method, **kwargs)
+    return np.array([starts, ends]).T.tolist()
 
 
 def get_sentences_with_timings(words_with_timings):
@@ -107,6 +550,85 @@ def get_sentences_with_timings(words_with_timings):
     return sentences, time_ranges
 
 
+def update_sentence_timings(
+    words_with_timings,
+    old_sentence_timings,
+    new_sentences,
+    **kwargs
+):
+    """
+    Incremental version of get_sentence_timings for when a few sentences
+    of a transcript have been edited. Sentences which are unchanged from
+    old_sentence_timings, a list of triplets (sentence, start, end), keep
+    their old times, and each run of changed sentences is only aligned
+    against the words lying between its unchanged neighbors. Boundaries
+    are snapped to the words of the whole transcript, so the result
+    matches that of get_sentence_timings on new_sentences.
+    """
+    old_sentences = [sent for sent, start, end in old_sentence_timings]
+    words, starts, ends = zip(*words_with_timings)
+    starts = np.array(starts)
+    ends = np.array(ends)
+    full_text = "".join(words)
+    word_indices = np.array([0, *np.cumsum(list(map(len, words))[:-1])])
+    aligner = None
+
+    # The words of deleted sentences now belong to a neighbor, so each
+    # deletion is realigned together with an adjacent unchanged sentence
+    matcher = SequenceMatcher(None, old_sentences, new_sentences, autojunk=False)
+    opcodes = [list(opcode) for opcode in matcher.get_opcodes()]
+    for n, (tag, i1, i2, j1, j2) in enumerate(opcodes):
+        if tag != "delete":
+            continue
+        if n > 0 and opcodes[n - 1][0] == "equal":
+            opcodes[n - 1][2] -= 1
+            opcodes[n - 1][4] -= 1
+            opcodes[n] = ["replace", i1 - 1, i2, j1 - 1, j2]
+        elif n + 1 < len(opcodes) and opcodes[n + 1][0] == "equal":
+            opcodes[n + 1][1] += 1
+            opcodes[n + 1][3] += 1
+            opcodes[n] = ["replace", i1, i2 + 1, j1, j2 + 1]
+
+    time_ranges = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            time_ranges.extend([start, end] for sent, start, end in old_sentence_timings[i1:i2])
+            continue
+        if j1 == j2:
+            continue
+        lo = 0
+        hi = len(words)
+        if i1 > 0:
+            lo = np.searchsorted(ends, old_sentence_timings[i1 - 1][2], side="right")
+        if i2 < len(old_sentence_timings):
+            hi = np.searchsorted(starts, old_sentence_timings[i2][1], side="left")
+        if lo >= hi:
+            # No words left for the changed sentences, so start over
+            return get_sentence_timings(words_with_timings, new_sentences, **kwargs)
+        if aligner is None:
+            aligner = SentenceAligner(full_text, **kwargs)
+        end_index = word_indices[hi] if hi < len(words) else len(full_text)
+        sent_indices = aligner.get_indices(new_sentences[j1:j2], word_indices[lo], end_index)
+
+        # Snap to the words of the whole transcript, as in
+        # get_sentence_time_arrays, so that the run ends with the word
+        # just before the next unchanged sentence
+        word_starts = nearest_indices(word_indices, sent_indices[:-1])
+        word_ends = nearest_indices(word_indices, sent_indices[1:]) - 1
+        time_ranges.extend(np.array([starts[word_starts], ends[word_ends]]).T.tolist())
+    return time_ranges
+
+
+def update_aligning_substrings(full_text, old_substrings, new_sentences, **kwargs):
+    """
+    Incremental version of find_closest_aligning_substrings for when
+    full_text was formed from new_sentences, an edited version of
+    old_substrings. See SentenceAligner.update_substrings.
+    """
+    aligner = SentenceAligner(full_text, new_sentences, **kwargs)
+    return aligner.update_substrings(old_substrings)
+
+
 def write_sentence_timing_file(sentences, time_ranges, file_path):
     # Add warning for long sentences
     if max(map(len, sentences)) > 2000:
@@ -125,52 +647,95 @@ def extract_sentences(sentence_timings_path):
     return [obj[0] for obj in json_load(sentence_timings_path)]
 
 
-def get_substring_timings_from_srt(srt_file, end_marks=SENTENCE_ENDING_PATTERN, split_at_segments=False, max_length=np.inf):
-    subs = pysrt.open(srt_file)
-    full_text = ""
-    sent_delim_times = [sub_rip_time_to_seconds(subs[0].start)]
-    result = []
-
-    for sub in subs:
-        text = sub.text.replace("\n", " ").strip()
+def stream_substring_timings_from_srt(srt_file, end_marks=SENTENCE_ENDING_PATTERN):
+    """
+    Yields [substring, start, end] for the pieces of each srt segment
+    split at end_marks, with times interpolated from those of the segment
+    """
+    for text, start, end in stream_srt_segments(srt_file):
+        text = text.replace("\n", " ").strip()
         if len(text) == 0:
             continue
-        full_text = " ".join([full_text, text])
-        start = sub_rip_time_to_seconds(sub.start)
-        end = sub_rip_time_to_seconds(sub.end)
 
         end_matches = [match.end() for match in re.finditer(end_marks, text)]
         split_indices = [0, *end_matches, len(text)]
         times = [interpolate(start, end, index / len(text)) for index in split_indices]
         substrs = [text[lh:rh] for lh, rh in zip(split_indices, split_indices[1:])]
 
-        result.extend([
-            [substr, start, end]
-            for substr, start, end in zip(substrs, times, times[1:])
-            if len(substr) > 0
-        ])
+        for substr, lh_time, rh_time in zip(substrs, times, times[1:]):
+            if len(substr) > 0:
+                yield [substr, lh_time, rh_time]
+
+
+def merge_substring_timings(substring_timings, end_marks=SENTENCE_ENDING_PATTERN, max_length=np.inf):
+    """
+    Joins consecutive pieces from an iterable of [substring, start, end]
+    until each one contains a match for end_marks or is longer than
+    max_length, yielding the merged pieces as it goes
+    """
+    parts = []
+    for substr, start, end in substring_timings:
+        if not parts:
+            parts, curr_start, curr_end = [substr], start, end
+            length = len(substr)
+            has_end_mark = bool(re.search(end_marks, substr))
+        elif has_end_mark or length > max_length:
+            yield [" ".join(parts), curr_start, curr_end]
+            parts, curr_start, curr_end = [substr], start, end
+            length = len(substr)
+            has_end_mark = bool(re.search(end_marks, substr))
+        else:
+            # The current string has no end mark, so any new match must
+            # involve the join or the new piece
+            junction = parts[-1][-1:] + " " + substr
+            has_end_mark = bool(re.search(end_marks, junction))
+            parts.append(substr)
+            length += 1 + len(substr)
+            curr_end = end  # Push back end time
+    if parts:
+        yield [" ".join(parts), curr_start, curr_end]
 
+
+def get_substring_timings_from_srt(srt_file, end_marks=SENTENCE_ENDING_PATTERN, split_at_segments=False, max_length=np.inf):
+    substring_timings = stream_substring_timings_from_srt(srt_file, end_marks)
     if not split_at_segments:
-        merged_pieces = []
-        all_pieces = list(result)
-        curr = all_pieces.pop(0)
-        while all_pieces:
-            if re.findall(end_marks, curr[0]) or len(curr[0]) > max_length:
-                merged_pieces.append(curr)
-                curr = all_pieces.pop(0)
-            else:
-                new = all_pieces.pop(0)
-                curr[0] = " ".join([curr[0], new[0]])  # Merge strings
-                curr[2] = new[2]  # Push back end time
-        merged_pieces.append(curr)
-        result = merged_pieces
-
-    return result
+        substring_timings = merge_substring_timings(substring_timings, end_marks, max_length)
+    return list(substring_timings)
+
+
+def group_substrings_by_time_range(substring_timings, time_ranges, alpha=0.5):
+    """
+    Given a list of [substring, start, end], e.g. chunks of a translated srt,
+    and a list of [start, end] time ranges, e.g. those of the english
+    sentences, each substring is assigned to the first time range ending
+    after the point alpha of the way through that substring.
+
+    Returns a list with the joined substrings for each time range
+    """
+    groups = [[] for _ in time_ranges]
+    if len(substring_timings) > 0 and len(time_ranges) > 0:
+        substrs, starts, ends = zip(*substring_timings)
+        mid_times = interpolate(np.array(starts), np.array(ends), alpha)
+        # A running max keeps the range ends sorted, without changing
+        # which range first ends after a given time
+        range_ends = np.maximum.accumulate(np.array(time_ranges)[:, 1])
+        order = np.argsort(mid_times, kind="stable")
+        range_indices = np.searchsorted(range_ends, mid_times[order], side="right")
+        for index, range_index in zip(order, range_indices):
+            if range_index < len(groups):
+                groups[range_index].append(substrs[index].strip())
+    return [" ".join(group).strip() for group in groups]
 
 
 # Hopefully all functions below here are no longer needed
-def index_of_nearest_match(word, time, all_words, all_times, index_radius=5):
-    guess = np.argmin(np.abs(all_times - time))
+def index_of_nearest_match(word, time, all_words, all_times, index_radius=5, guess=None):
+    """
+    Index of a word near the given time which best matches word. The
+    initial guess, if not passed in, is the entry of all_times closest to
+    time, with all_times assumed to be sorted.
+    """
+    if guess is None:
+        guess = nearest_indices(all_times, [time])[0]
     lev_dist = Levenshtein.distance(word, all_words[guess])
     indices = list(range(
         max(guess - index_radius, 0),
@@ -191,11 +756,13 @@ def refine_sentence_time_ranges(
     ends: np.ndarray,
     index_radius=5,
 ):
+    rough_starts, rough_ends = np.reshape(rough_ranges, (-1, 2)).T
+    start_guesses = nearest_indices(starts, rough_starts)
+    end_guesses = nearest_indices(ends, rough_ends)
     refined_ranges = []
-    for sentence, (start, end) in zip(sentences, rough_ranges):
+    for sentence, start_guess, end_guess in zip(sentences, start_guesses, end_guesses):
         sent_words = sentence.strip().split(" ")
-        start_index = index_of_nearest_match(sent_words[0], start, words, starts, index_radius)
-        end_index = index_of_nearest_match(sent_words[-1], end, words, ends, index_radius)
+        start_index = index_of_nearest_match(sent_words[0], None, words, starts, index_radius, start_guess)
+        end_index = index_of_nearest_match(sent_words[-1], None, words, ends, index_radius, end_guess)
         refined_ranges.append([starts[start_index], ends[end_index]])
     return refined_ranges
-
@@ -1,34 +1,97 @@
+import os
 import re
 import regex
+import bisect
+import itertools
 import numpy as np
 from pathlib import Path
-import pysrt
-import datetime
+
+try:
+    # Only needed to convert to and from pysrt objects
+    import pysrt
+except ImportError:
+    pysrt = None
 
 from helpers import interpolate
+from helpers import write_if_changed
+from helpers import json_dumps
 from helpers import SENTENCE_ENDING_PATTERN
 from helpers import PUNCTUATION_PATTERN
 
+PUNCTUATION_REGEX = regex.compile(PUNCTUATION_PATTERN)
+SENTENCE_END_DOT_REGEX = regex.compile(r"\.$")
+SRT_TIME_SEPARATOR_REGEX = re.compile(r"[:.,]")
+SRT_INTEGER_REGEX = re.compile(r"\d+")
+TIMESTAMP_REGEX = re.compile(r"(\d+):(\d+):(\d+)(?:,(\d+))?")
+FIXED_WIDTH_TIMESTAMP_DIGITS = [0, 1, 3, 4, 6, 7, 9, 10, 11]
+FIXED_WIDTH_TIMESTAMP_WEIGHTS = np.array([36000000, 3600000, 600000, 60000, 10000, 1000, 100, 10, 1])
+CAPTION_FORMATS = ["srt", "vtt", "json", "txt"]
+SRT_ENTRY_REGEX = re.compile(
+    r"\s*\d+\n(\d+:\d\d:\d\d,\d\d\d) --> (\d+:\d\d:\d\d,\d\d\d)\n((?:(?=[^\n]*\S)[^\n]*\n)*)"
+)
+LINE_END_WHITESPACE_REGEX = re.compile(r"[^\S\n]+(?=\n)")
+
+
+def seconds_to_milliseconds(seconds):
+    """
+    Converts an array of times in seconds to integer milliseconds, rounding
+    down, but with a little slack so that times which came from whole
+    milliseconds (like 1.001) don't drift down by one
+    """
+    return np.floor(np.asarray(seconds, dtype=float) * 1000 + 1e-6).astype(np.int64)
+
+
+def milliseconds_to_seconds(milliseconds):
+    # Matches sub_rip_time_to_seconds, so floats are identical to those pysrt gave
+    return milliseconds // 1000 + (milliseconds % 1000) / 1000.0
+
+
+def format_times(seconds):
+    """
+    Formats an array of times in seconds as a list of HH:MM:SS,mmm
+    timestamps, showing negative times as zero, as pysrt does
+    """
+    milliseconds = np.maximum(seconds_to_milliseconds(seconds), 0)
+    hours, milliseconds = np.divmod(milliseconds, 3600000)
+    minutes, milliseconds = np.divmod(milliseconds, 60000)
+    seconds, milliseconds = np.divmod(milliseconds, 1000)
+    return [
+        f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+        for h, m, s, ms in zip(hours.tolist(), minutes.tolist(), seconds.tolist(), milliseconds.tolist())
+    ]
+
+
+def unformat_times(timestamps):
+    """
+    Parses a sequence of HH:MM:SS,mmm timestamps, where the milliseconds
+    are optional, into an array of times in seconds
+    """
+    timestamps = [timestamp.strip() for timestamp in timestamps]
+    text = "\n".join(timestamps) + "\n"
+    if len(text) == 13 * len(timestamps) and text.isascii():
+        # Typically they all look like HH:MM:SS,mmm, so read the digits straight from the bytes
+        chars = np.frombuffer(text.encode(), dtype=np.uint8).reshape(-1, 13)
+        digits = chars[:, FIXED_WIDTH_TIMESTAMP_DIGITS] - ord("0")
+        if (digits <= 9).all() and (chars[:, [2, 5, 8]] == [ord(":"), ord(":"), ord(",")]).all():
+            return milliseconds_to_seconds(digits.astype(np.int64) @ FIXED_WIDTH_TIMESTAMP_WEIGHTS)
+
+    milliseconds = []
+    for timestamp in timestamps:
+        match = TIMESTAMP_REGEX.fullmatch(timestamp)
+        if match is None:
+            raise Exception(f"Incorrectly formatted timestamp: {timestamp}")
+        hours, minutes, seconds, ms = map(int, match.groups(default="0"))
+        milliseconds.append(3600000 * hours + 60000 * minutes + 1000 * seconds + ms)
+    return milliseconds_to_seconds(np.array(milliseconds, dtype=np.int64))
+
 
 def format_time(seconds):
     # Function to convert seconds to HH:MM:SS,mmm format
-    delta = datetime.timedelta(seconds=seconds)
-    hours, remainder = divmod(delta.seconds, 3600)
-    minutes, seconds = divmod(remainder, 60)
-    milliseconds = delta.microseconds // 1000
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+    return format_times([seconds])[0]
 
 
 def unformat_time(timestamp):
-    if not (timestamp.count(":") == 2 and timestamp.count(",") <= 1):
-        raise Exception(f"Incorrectly formatted timestamp: {timestamp}")
-    if "," in timestamp:
-        hms, miliseconds = timestamp.split(",")
-    else:
-        hms = timestamp
-        miliseconds = 0
-    hours, minutes, seconds = hms.split(":")
-    return 3600 * int(hours) + 60 * int(minutes) + int(seconds) + 0.001 * int(miliseconds)
+    return float(unformat_times([timestamp])[0])
 
 
 def sub_rip_time_to_seconds(sub_rip_time):
@@ -40,25 +103,227 @@ def sub_rip_time_to_seconds(sub_rip_time):
     ))
 
 
-def write_srt(segments, file_name):
-    subrip_items = [
-        pysrt.SubRipItem(
-            index=index,
-            start=pysrt.SubRipTime.from_ordinal(int(start_seconds * 1000)),
-            end=pysrt.SubRipTime.from_ordinal(int(end_seconds * 1000)),
-            text=text,
+def sub_rip_times_to_seconds(sub_rip_times):
+    return milliseconds_to_seconds(np.array([time.ordinal for time in sub_rip_times], dtype=np.int64))
+
+
+def parse_srt_timestamp(timestamp):
+    """
+    Returns the number of milliseconds in an HH:MM:SS,mmm timestamp, as
+    leniently as pysrt parses them, or None if it is malformed
+    """
+    if not timestamp:
+        return 0
+    parts = SRT_TIME_SEPARATOR_REGEX.split(timestamp)
+    if len(parts) != 4:
+        return None
+    values = []
+    for part in parts:
+        try:
+            values.append(int(part))
+        except ValueError:
+            match = SRT_INTEGER_REGEX.match(part)
+            values.append(int(match.group()) if match else 0)
+    hours, minutes, seconds, milliseconds = values
+    return 3600000 * hours + 60000 * minutes + 1000 * seconds + milliseconds
+
+
+def parse_srt_block(lines):
+    """
+    Returns (text, start_milliseconds, end_milliseconds) for the lines of one
+    srt entry, or None if they are malformed, in which case pysrt skips it
+    """
+    if len(lines) < 2:
+        return None
+    if "-->" not in lines[0]:
+        # Drop the index
+        lines = lines[1:]
+    timestamps = lines[0].split("-->")
+    if len(timestamps) != 2:
+        return None
+    start = parse_srt_timestamp(timestamps[0].strip())
+    end = parse_srt_timestamp(timestamps[1].lstrip().split(" ", 1)[0].strip())
+    if start is None or end is None:
+        return None
+    return "\n".join(lines[1:]), start, end
+
+
+def stream_srt_blocks(srt_file):
+    """
+    Yields (text, start_milliseconds, end_milliseconds) for each entry of
+    an srt file, as it is read
+    """
+    block = []
+    with open(srt_file, "r", encoding="utf-8-sig") as fp:
+        for line in itertools.chain(fp, ["\n"]):
+            if line.strip():
+                block.append(line.rstrip())
+            elif block:
+                entry = parse_srt_block(block)
+                block = []
+                if entry is not None:
+                    yield entry
+
+
+def parse_well_formed_srt(content):
+    """
+    Parses the contents of an srt file in which every entry is an index,
+    then a plain "HH:MM:SS,mmm --> HH:MM:SS,mmm" line, then its text, as
+    all those we write are. Returns a SubtitleTrack, identical to what the
+    lenient parser would give, or None if any entry is not of that form.
+    """
+    # Lines are compared with trailing whitespace stripped, as pysrt does
+    content = LINE_END_WHITESPACE_REGEX.sub("", content.rstrip() + "\n")
+    texts = []
+    start_stamps = []
+    end_stamps = []
+    position = 0
+    while position < len(content) and content != "\n":
+        match = SRT_ENTRY_REGEX.match(content, position)
+        if match is None:
+            return None
+        start, end, body = match.groups()
+        start_stamps.append(start)
+        end_stamps.append(end)
+        texts.append(body[:-1])
+        position = match.end()
+    return SubtitleTrack(texts, unformat_times(start_stamps), unformat_times(end_stamps))
+
+
+def stream_srt_segments(srt_file):
+    """
+    Yields (text, start_seconds, end_seconds) for each segment of an
+    srt file, as it is read, without holding the whole file in memory
+    """
+    for text, start, end in stream_srt_blocks(srt_file):
+        yield (text, milliseconds_to_seconds(start), milliseconds_to_seconds(end))
+
+
+class SubtitleTrack:
+    """
+    Subtitles held as a list of texts, together with arrays of their start
+    and end times in seconds, rather than as one object per segment
+    """
+    def __init__(self, texts=(), starts=(), ends=()):
+        self.texts = list(texts)
+        self.starts = np.array(starts, dtype=float)
+        self.ends = np.array(ends, dtype=float)
+        if not len(self.texts) == len(self.starts) == len(self.ends):
+            raise Exception("Subtitle texts, starts and ends must have the same length")
+
+    @classmethod
+    def from_segments(cls, segments):
+        segments = list(segments)
+        return cls(
+            [text for text, start, end in segments],
+            [start for text, start, end in segments],
+            [end for text, start, end in segments],
         )
-        for index, (text, start_seconds, end_seconds) in enumerate(segments, start=1)
-    ]
-    # Save the subtitles to an SRT file
-    subs = pysrt.SubRipFile(items=subrip_items)
-    subs.save(file_name, encoding='utf-8')
-    return file_name
+
+    @classmethod
+    def from_srt(cls, srt_file):
+        with open(srt_file, "r", encoding="utf-8-sig") as fp:
+            track = parse_well_formed_srt(fp.read())
+        if track is not None:
+            return track
+        # Otherwise go entry by entry, as leniently as pysrt
+        texts = []
+        times = []
+        for text, start, end in stream_srt_blocks(srt_file):
+            texts.append(text)
+            times.append((start, end))
+        times = np.array(times, dtype=np.int64).reshape(-1, 2)
+        return cls(texts, *milliseconds_to_seconds(times).T)
+
+    @classmethod
+    def from_pysrt(cls, subs):
+        subs = list(subs)
+        return cls(
+            [sub.text for sub in subs],
+            sub_rip_times_to_seconds([sub.start for sub in subs]),
+            sub_rip_times_to_seconds([sub.end for sub in subs]),
+        )
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        # Yields (text, start_seconds, end_seconds) for each segment
+        return zip(self.texts, self.starts.tolist(), self.ends.tolist())
+
+    def to_srt(self, eol=os.linesep):
+        """
+        Serializes the track in the same format as pysrt.SubRipFile.save
+        """
+        entries = []
+        start_stamps = format_times(self.starts)
+        end_stamps = format_times(self.ends)
+        for index, (text, start, end) in enumerate(zip(self.texts, start_stamps, end_stamps), start=1):
+            entry = f"{index}\n{start} --> {end}\n{text}\n"
+            if not entry.endswith("\n\n"):
+                entry += "\n"
+            entries.append(entry)
+        result = "".join(entries)
+        if eol != "\n":
+            result = result.replace("\n", eol)
+        return result
+
+    def write_srt(self, file_name):
+        write_if_changed(self.to_srt(), file_name)
+        return file_name
+
+    def to_vtt(self):
+        start_stamps = format_times(self.starts)
+        end_stamps = format_times(self.ends)
+        cues = [
+            f"{start.replace(',', '.')} --> {end.replace(',', '.')}\n{text}\n\n"
+            for text, start, end in zip(self.texts, start_stamps, end_stamps)
+        ]
+        return "WEBVTT\n\n" + "".join(cues)
+
+    def write_vtt(self, file_name):
+        write_if_changed(self.to_vtt(), file_name)
+        return file_name
+
+    def to_json_cues(self):
+        # Times are rounded to the millisecond, just as in the srt
+        starts = milliseconds_to_seconds(seconds_to_milliseconds(self.starts)).tolist()
+        ends = milliseconds_to_seconds(seconds_to_milliseconds(self.ends)).tolist()
+        return [
+            dict(start=start, end=end, text=text)
+            for text, start, end in zip(self.texts, starts, ends)
+        ]
+
+    def write_json(self, file_name):
+        # Formatted as json_dump would
+        write_if_changed(json_dumps(self.to_json_cues()), file_name)
+        return file_name
+
+    def to_pysrt(self):
+        if pysrt is None:
+            raise Exception("pysrt is not installed")
+        starts = seconds_to_milliseconds(self.starts).tolist()
+        ends = seconds_to_milliseconds(self.ends).tolist()
+        return pysrt.SubRipFile(items=[
+            pysrt.SubRipItem(
+                index=index,
+                start=pysrt.SubRipTime.from_ordinal(start),
+                end=pysrt.SubRipTime.from_ordinal(end),
+                text=text,
+            )
+            for index, (text, start, end) in enumerate(zip(self.texts, starts, ends), start=1)
+        ])
+
+
+def write_srt(segments, file_name):
+    return SubtitleTrack.from_segments(segments).write_srt(file_name)
 
 
 def srt_to_txt(srt_file, txt_file_name="transcript"):
-    subs = pysrt.open(srt_file)
-    text = " ".join([sub.text.replace("\n", " ") for sub in subs])
+    text = " ".join(
+        text.replace("\n", " ")
+        for text, start, end in stream_srt_segments(srt_file)
+    )
     if not re.findall("[.!?]$", text):
         text += "."
 
@@ -75,14 +340,95 @@ def srt_to_txt(srt_file, txt_file_name="transcript"):
         fp.write("\n".join(sentences))
 
 
-def write_srt_from_sentences_and_time_ranges(
-    sentences,
-    time_ranges,
-    output_file_path,
-    max_chars_per_segment=90,
-):
+def nearest_value(sorted_values, target):
+    """
+    Entry of a non-empty sorted list closest to target,
+    with ties going to the earlier entry
+    """
+    index = bisect.bisect_left(sorted_values, target)
+    if index == len(sorted_values):
+        return sorted_values[-1]
+    if index > 0 and target - sorted_values[index - 1] <= sorted_values[index] - target:
+        return sorted_values[index - 1]
+    return sorted_values[index]
+
+
+def get_punctuation_breaks(sentence, punc_starts, punc_ends, lh, rh):
+    """
+    Returns the ends of the matches which PUNCTUATION_PATTERN would find
+    in sentence[lh:rh], given the starts and ends of its matches over
+    the full sentence.
+
+    The two only differ at the edges of the slice. Matches relying on a
+    lookbehind need the preceding character to lie within the slice,
+    whitespace is truncated at the slice's end, and '\.$' can match
+    there. So the full sentence matches are used for the interior, and
+    the pattern is only rerun over the last couple characters.
+    """
+    tail_start = max(lh + 1, rh - 2)
+    lo = bisect.bisect_right(punc_starts, lh)
+    hi = bisect.bisect_left(punc_starts, tail_start)
+    result = [min(end, rh) for end in punc_ends[lo:hi]]
+    if tail_start == lh + 1 and SENTENCE_END_DOT_REGEX.match(sentence, lh, rh):
+        # Without a preceding character, only '\.$' can match at the start
+        result.append(lh + 1)
+    result.extend(match.end() for match in PUNCTUATION_REGEX.finditer(sentence, tail_start, rh))
+    return result
+
+
+def get_caption_cuts(sentence, max_chars_per_segment=90):
+    """
+    Returns the indices at which to cut a sentence into caption segments,
+    starting with 0 and ending with len(sentence).
+
+    Cuts are biased towards punctuation marks, then spaces, while trying
+    to keep the segments from being too uneven. All possible break points
+    are found once, and each cut is chosen with a binary search over them.
+    """
     mcps = max_chars_per_segment
+    n_chars = len(sentence)
+    n_segments = int(np.ceil(n_chars / mcps))
+    best_step = (n_chars // n_segments)
+    half = mcps // 2
+
+    punc_matches = list(PUNCTUATION_REGEX.finditer(sentence))
+    punc_starts = [match.start() for match in punc_matches]
+    punc_ends = [match.end() for match in punc_matches]
+    space_ends = [match.end() for match in re.finditer(" ", sentence)]
+
+    cuts = [0]
+    while cuts[-1] < n_chars:
+        lh = cuts[-1]
+        rh = lh + mcps
+        best_cut = lh + best_step
+        if rh >= n_chars:
+            # We're at the end of a sentence
+            cuts.append(n_chars)
+            continue
+        # Consider breaks in the second half of the window
+        punc_indices = get_punctuation_breaks(sentence, punc_starts, punc_ends, lh + half, rh)
+        space_indices = space_ends[
+            bisect.bisect_right(space_ends, lh + half):bisect.bisect_right(space_ends, rh)
+        ]
+        if punc_indices:
+            # Try to cut on a punctuation mark
+            cuts.append(nearest_value(punc_indices, best_cut))
+        elif space_indices:
+            # Otherwise, at least cut on a space
+            cuts.append(nearest_value(space_indices, best_cut))
+        else:
+            # Otherwise, e.g. in character-based languages, just take what you can get
+            cuts.append(best_cut)
+    return cuts
+
+
+def segment_sentences(sentences, time_ranges, max_chars_per_segment=90):
+    """
+    Splits each sentence into caption segments, interpolating their
+    times from the sentence's time range.
 
+    Returns a list of texts, and arrays of start and end times
+    """
     texts = []
     starts = []
     ends = []
@@ -90,42 +436,56 @@ def write_srt_from_sentences_and_time_ranges(
         n_chars = len(sentence)
         if n_chars == 0:
             continue
-        # Bias towards cuts which are on punctuation marks,
-        # and try to keep the segments from being too uneven
-        n_segments = int(np.ceil(n_chars / mcps))
-        best_step = (n_chars // n_segments)
-        half = mcps // 2
-        cuts = [0]
-        while cuts[-1] < n_chars:
-            lh = cuts[-1]
-            rh = lh + mcps
-            best_cut = lh + best_step
-            punc_indices, space_indices = [
-                [lh + half + match.end() for match in regex.finditer(pattern, sentence[lh + half:rh])]
-                for pattern in [PUNCTUATION_PATTERN, " "]
-            ]
-            if rh >= n_chars:
-                # We're at the end of a sentence
-                cuts.append(n_chars)
-            elif punc_indices:
-                # Try to cut on a punctuation mark
-                index = np.argmin([abs(pi - best_cut) for pi in punc_indices])
-                cuts.append(punc_indices[index])
-            elif space_indices:
-                # Otherwise, at least cut on a space
-                index = np.argmin([abs(si - best_cut) for si in space_indices])
-                cuts.append(space_indices[index])
-            else:
-                # Otherwise, e.g. in character-based languages, just take what you can get
-                cuts.append(best_cut)
-        for lh, rh in zip(cuts, cuts[1:]):
-            texts.append(sentence[lh:rh])
-            starts.append(interpolate(start_time, end_time, lh / n_chars))
-            ends.append(interpolate(start_time, end_time, rh / n_chars),)
+        cuts = get_caption_cuts(sentence, max_chars_per_segment)
+        texts.extend(sentence[lh:rh] for lh, rh in zip(cuts, cuts[1:]))
+        alphas = np.array(cuts) / n_chars
+        starts.append(interpolate(start_time, end_time, alphas[:-1]))
+        ends.append(interpolate(start_time, end_time, alphas[1:]))
+    if not texts:
+        return [], np.zeros(0), np.zeros(0)
+
     # Correct the case of time overlaps between sentences causing things to get out of order
-    starts.sort()
-    ends.sort()
+    return texts, np.sort(np.hstack(starts)), np.sort(np.hstack(ends))
+
+
+def write_srt_from_sentences_and_time_ranges(
+    sentences,
+    time_ranges,
+    output_file_path,
+    max_chars_per_segment=90,
+):
+    texts, starts, ends = segment_sentences(sentences, time_ranges, max_chars_per_segment)
+    SubtitleTrack(texts, starts, ends).write_srt(output_file_path)
+
+
+def write_caption_files(
+    sentences,
+    time_ranges,
+    output_file_path,
+    formats=("srt",),
+    max_chars_per_segment=90,
+):
+    """
+    Segments the sentences once, then writes the resulting cues in each of the
+    given CAPTION_FORMATS, to output_file_path with the suffix swapped to match.
+    The txt format is the sentences themselves, one per line.
 
-    # Write the srt
-    segments = list(zip(texts, starts, ends))
-    write_srt(segments, output_file_path)
+    Returns the list of paths written
+    """
+    texts, starts, ends = segment_sentences(sentences, time_ranges, max_chars_per_segment)
+    track = SubtitleTrack(texts, starts, ends)
+    paths = []
+    for caption_format in formats:
+        path = Path(output_file_path).with_suffix("." + caption_format)
+        if caption_format == "srt":
+            track.write_srt(path)
+        elif caption_format == "vtt":
+            track.write_vtt(path)
+        elif caption_format == "json":
+            track.write_json(path)
+        elif caption_format == "txt":
+            write_if_changed("\n".join(sentences), path)
+        else:
+            raise Exception(f"Unknown caption format {caption_format}, expected one of {CAPTION_FORMATS}")
+        paths.append(path)
+    return paths
@@ -0,0 +1,117 @@
+import os
+import numpy as np
+from functools import lru_cache
+from pathlib import Path
+
+from helpers import json_load
+
+from srt_ops import SubtitleTrack
+
+
+# Files with the time ranges of whole sentences, in order of preference
+SENTENCE_FILE_NAMES = ["sentence_translations.json", "sentence_timings.json"]
+
+
+def load_timed_texts(path):
+    """
+    Returns a SubtitleTrack of the sentences in a sentence translation or
+    sentence timing file, or of the cues in an srt
+    """
+    path = Path(path)
+    if path.suffix == ".srt":
+        return SubtitleTrack.from_srt(path)
+    data = json_load(path)
+    if path.name == "sentence_translations.json":
+        # Older translations may not have time ranges
+        data = [obj for obj in data if "start" in obj]
+        return SubtitleTrack(
+            [obj["translatedText"] for obj in data],
+            [obj["start"] for obj in data],
+            [obj["end"] for obj in data],
+        )
+    return SubtitleTrack(
+        [sentence for sentence, start, end in data],
+        [start for sentence, start, end in data],
+        [end for sentence, start, end in data],
+    )
+
+
+class TrackTimeIndex:
+    """
+    Entries of one track sorted by start time, together with the running
+    maximum of their end times, so the entries overlapping any time range
+    can be found with two binary searches, even if some entries overlap.
+    """
+    def __init__(self, track):
+        self.order = np.argsort(track.starts, kind="stable")
+        self.texts = [track.texts[i] for i in self.order]
+        self.starts = track.starts[self.order]
+        self.ends = track.ends[self.order]
+        self.max_ends = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    def overlapping(self, start, end):
+        """
+        Returns (index, text, start, end) for each entry which is on screen
+        at some point between start and end, that is, with entry_start <= end
+        and entry_end > start. Indices refer to the order in the file.
+        """
+        hi = np.searchsorted(self.starts, end, side="right")
+        lo = np.searchsorted(self.max_ends, start, side="right")
+        found = np.arange(lo, hi)[self.ends[lo:hi] > start]
+        return [
+            (int(self.order[i]), self.texts[i], float(self.starts[i]), float(self.ends[i]))
+            for i in found.tolist()
+        ]
+
+
+class VideoTimeIndex:
+    """
+    Answers which sentences and cues are on screen at a given time, or
+    within a time range, across every language of one video.
+
+    Results map language to file stem (e.g. sentence_translations,
+    auto_generated, community) to the overlapping entries. Each file is
+    indexed when first needed, and re-indexed whenever its modification
+    time or size changes.
+    """
+    def __init__(self, caption_dir):
+        self.caption_dir = Path(caption_dir)
+        self.file_indices = dict()  # Path -> ((mtime, size), TrackTimeIndex)
+
+    def get_indexed_files(self):
+        result = []
+        for lang_dir in sorted(self.caption_dir.iterdir()):
+            if not lang_dir.is_dir():
+                continue
+            sentence_files = [Path(lang_dir, name) for name in SENTENCE_FILE_NAMES]
+            sentence_files = [path for path in sentence_files if os.path.exists(path)]
+            result.extend(sentence_files[:1])
+            result.extend(sorted(lang_dir.glob("*.srt")))
+        return result
+
+    def refresh(self):
+        file_indices = dict()
+        for path in self.get_indexed_files():
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            entry = self.file_indices.get(path)
+            if entry is None or entry[0] != signature:
+                entry = (signature, TrackTimeIndex(load_timed_texts(path)))
+            file_indices[path] = entry
+        self.file_indices = file_indices
+
+    def between(self, start, end):
+        self.refresh()
+        result = dict()
+        for path, (signature, index) in self.file_indices.items():
+            result.setdefault(path.parent.name, dict())[path.stem] = index.overlapping(start, end)
+        return result
+
+    def at(self, time):
+        return self.between(time, time)
+
+
+@lru_cache()
+def get_video_time_index(caption_dir):
+    # Shared, so that repeated queries on a video reuse its index
+    return VideoTimeIndex(caption_dir)
@@ -1,6 +1,5 @@
 import subprocess
 import re
-import pandas
 import csv
 from functools import lru_cache
 
@@ -13,7 +12,6 @@ LOCAL_REPO = CAPTIONS_DIRECTORY  # Should change
 @lru_cache()
 def manual_entries():
     file = Path(Path(__file__).parent, "data", "manually-added-contributors.csv")
-    df = pandas.read_csv(file)
     result = dict()
     with open(file, newline='') as csvfile:
         rows = csv.reader(csvfile)
@@ -1,10 +1,6 @@
 from functools import lru_cache
-import torch
 from pathlib import Path
 
-import whisper
-from whisper.utils import get_writer
-
 from helpers import temporary_message
 from helpers import get_sentences
 from helpers import json_dump
@@ -19,6 +15,8 @@ from srt_ops import write_srt_from_sentences_and_time_ranges
 
 @lru_cache()
 def load_whisper_model(model_name="medium.en"):
+    # whisper and torch take seconds to import, so only load them for transcribing
+    import whisper
     with temporary_message("Loading Whisper model"):
         model = whisper.load_model(model_name)
     return model
@@ -37,6 +35,7 @@ def transcribe_file(
     A dictionary containing the resulting text ("text") and segment-level details ("segments"), and
     the spoken language ("language"), which is detected when `decode_options["language"]` is None.
     """
+    import torch
     with temporary_message(f"Transcribing file: {audio_file}\n"):
         transcription = model.transcribe(
             audio_file,
@@ -81,6 +80,7 @@ def words_with_timings_to_srt(words_with_timings: list, srt_path: str | Path):
 
 
 def write_whisper_srt(transcription: dict, srt_path: str | Path):
+    from whisper.utils import get_writer
     srt_path = Path(srt_path)
     # Directly write whisper segments to file
     writer = get_writer("srt", str(srt_path.parent))
@@ -2,12 +2,6 @@ import os
 from functools import lru_cache
 from pathlib import Path
 
-from google.cloud import translate_v2 as translate
-from google.oauth2 import service_account
-
-import deepl
-from google_auth_oauthlib.flow import google
-
 from helpers import temporary_message
 from helpers import webids_to_directories
 from helpers import ensure_exists
@@ -19,7 +13,7 @@ from helpers import url_to_directory
 
 from download import download_video_title_and_description
 
-from srt_ops import write_srt_from_sentences_and_time_ranges
+from srt_ops import write_caption_files
 
 from sentence_timings import extract_sentences
 
@@ -57,6 +51,7 @@ def get_deepl_translator():
     if not os.path.exists(deepl_key_file):
         raise Exception(f"No API key file {deepl_key_file} not available")
     key = Path(deepl_key_file).read_text()
+    import deepl
     return deepl.Translator(key)
 
 
@@ -68,6 +63,8 @@ def get_google_translate_client(service_account_file=None):
         raise Exception(f"Environment variable {SERVICE_ACCOUNT_ENV_VARIABLE_NAME} not set")
     if service_account_file is None or not os.path.exists(service_account_file):
         raise Exception("No service account credentials for translating with the Google API")
+    from google.cloud import translate_v2 as translate
+    from google.oauth2 import service_account
     credentials = credentials = service_account.Credentials.from_service_account_file(service_account_file)
     return translate.Client(credentials=credentials)
 
@@ -116,6 +113,7 @@ def google_translate_sentences(
 
 
 def translate_sentences(en_sentences: list, target_language: str):
+    import deepl
     target_language_code = get_language_code(target_language)
     if target_language_code is None:
         raise Exception(f"Invalid language {target_language_code}")
@@ -171,7 +169,7 @@ def generate_sentence_translations(sentence_timings_path, target_language):
     return sentence_translation_file
 
 
-def sentence_translations_to_srt(sentence_translation_file):
+def sentence_translations_to_srt(sentence_translation_file, formats=("srt",)):
     translations = json_load(sentence_translation_file)
     directory = Path(sentence_translation_file).parent
     language = directory.stem
@@ -183,32 +181,33 @@ def sentence_translations_to_srt(sentence_translation_file):
     character_based = (language.lower() in ['chinese', 'japanese', 'korean'])
 
     with temporary_message(f"Writing {trans_srt}"):
-        write_srt_from_sentences_and_time_ranges(
+        write_caption_files(
             sentences=trans_sentences,
             time_ranges=time_ranges,
             output_file_path=trans_srt,
+            formats=formats,
             max_chars_per_segment=(30 if character_based else 90),
         )
     return trans_srt
 
 
-def write_translated_srt(sentence_timings_path, target_language):
+def write_translated_srt(sentence_timings_path, target_language, formats=("srt",)):
     # If it hasn't been translated before, generated the translation
     trans_file = get_sentence_translation_file(sentence_timings_path, target_language)
     if not os.path.exists(trans_file):
         generate_sentence_translations(sentence_timings_path, target_language)
     # Use the translation to write the new srt
-    return sentence_translations_to_srt(trans_file)
+    return sentence_translations_to_srt(trans_file, formats=formats)
 
 
-def translate_to_multiple_languages(sentence_timings_path, languages, skip_community_generated=False):
+def translate_to_multiple_languages(sentence_timings_path, languages, skip_community_generated=False, formats=("srt",)):
     cap_dir = Path(sentence_timings_path).parent.parent
     for language in languages:
         lang_dir = ensure_exists(Path(cap_dir, language.lower()))
         if skip_community_generated and any(f.endswith("community.srt") for f in os.listdir(lang_dir)):
             continue
         try:
-            write_translated_srt(sentence_timings_path, language)
+            write_translated_srt(sentence_timings_path, language, formats=formats)
         except Exception as e:
             print(f"Failed to translate {cap_dir.stem} to {language}\n{e}\n\n")
 
@@ -1,12 +1,6 @@
 import os
 from functools import lru_cache
 
-import google_auth_oauthlib.flow
-import googleapiclient.discovery
-import google.auth.transport.requests
-from google.oauth2.credentials import Credentials
-from googleapiclient.http import MediaFileUpload
-from googleapiclient.errors import HttpError
 import html
 import time
 
@@ -33,6 +27,12 @@ CREDIT_HEADER = "Thanks to these viewers for their contributions to translations
 
 @lru_cache()
 def get_youtube_api():
+    # The Google API clients are slow to import, so only load them once they're needed
+    import google_auth_oauthlib.flow
+    import googleapiclient.discovery
+    import google.auth.transport.requests
+    from google.oauth2.credentials import Credentials
+
     client_secrets_file = os.getenv(SECRETS_FILE_ENV_VARIABLE_NAME)
     credentials_file = os.getenv(CRENTIALS_FILE_ENV_VARIABLE_NAME)
     if client_secrets_file is None:
@@ -95,6 +95,7 @@ def delete_captions(youtube_api, video_id, language_code):
 
 
 def upload_caption(youtube_api, video_id, caption_file, name="", replace=False):
+    from googleapiclient.http import MediaFileUpload
     language_code = get_language_code(Path(caption_file).parent.stem)
     if replace:
         delete_captions(youtube_api, video_id, language_code)
@@ -127,6 +128,7 @@ def upload_caption(youtube_api, video_id, caption_file, name="", replace=False):
 
 
 def upload_video_localizations(youtube_api, caption_directory, video_id, languages=None):
+    from googleapiclient.errors import HttpError
     # Get the current video information, including localizations
     if languages is not None:
         languages = [lang.lower() for lang in languages]